@@ -0,0 +1,383 @@
+"""Local stand-ins for the Jira, GitHub and Ollama APIs used by the benchmarks
+
+One aiohttp server answers all three APIs from a synthetic, seeded dataset:
+
+- Jira: /rest/api/2/serverInfo, /rest/api/2/field and the paged /rest/api/2/search,
+  honouring the updated >= / <= bounds of the JQL so incremental syncs fetch less,
+  with changelogs, comments and worklogs when they are requested
+- GitHub: the aliased, cursor-paged PR searches of /graphql with commits, reviews
+  and lines changed, the 1000 result cap and a per-minute request quota reported in
+  X-RateLimit-* headers, answered with 403 once it is spent
+- Ollama: the streaming /api/generate endpoint, with a prompt evaluation rate,
+  a per-token latency and the token counts of the final response; a model is
+  loaded on first use and unloaded after its keep_alive, and the prompt prefix
+  shared with the previous generation (system prompt first) is not evaluated again
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from aiohttp import web
+
+JIRA_STATUSES = ['Done', 'Closed', 'In Progress', 'Code Review', 'To Do']
+JIRA_TYPES = ['Story', 'Bug', 'Task']
+PR_STATES = ['open', 'closed']
+WORDS = ('cache sync report parser pipeline retry flaky timeout upgrade metrics login '
+         'dashboard export import schema migration cleanup docs release build').split()
+
+def build_dataset(activities: int, seed: int, days: int = 13) -> Dict[str, List[Dict]]:
+    """Split the activities between Jira issues, authored PRs and reviewed PRs, dated over the last days"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    def updated() -> datetime:
+        return now - timedelta(seconds=rng.randint(60, days * 24 * 3600))
+
+    def title() -> str:
+        return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))).capitalize()
+
+    jira_count = activities // 2
+    authored_count = (activities - jira_count) * 2 // 3
+    reviewed_count = activities - jira_count - authored_count
+
+    bench_user = {'name': 'bench', 'emailAddress': 'bench@example.com'}
+    other_user = {'name': 'teammate', 'emailAddress': 'teammate@example.com'}
+
+    issues = []
+    for index in range(jira_count):
+        project = f"BENCH{index % 5}"
+        issue_updated = updated()
+        events = sorted(issue_updated - timedelta(hours=rng.randint(1, 72)) for _ in range(rng.randint(0, 3)))
+        issues.append({
+            'id': str(10000 + index),
+            'key': f"{project}-{index}",
+            'updated': issue_updated,
+            'fields': {
+                'summary': title(),
+                'status': {'name': rng.choice(JIRA_STATUSES)},
+                'issuetype': {'name': rng.choice(JIRA_TYPES)},
+                'assignee': bench_user,
+                'customfield_12310243': None
+            },
+            # a status change, a comment or a worklog per event, by the bench user or a teammate
+            'events': [(rng.choice(['status', 'comment', 'worklog']), rng.choice([bench_user, other_user]), when) for when in events]
+        })
+
+    def pull_request(number: int, author: str) -> Dict:
+        repo = f"repo-{number % 8}"
+        created = updated()
+        html_url = f"https://github.com/bench/{repo}/pull/{number}"
+        state = rng.choice(PR_STATES)
+        return {
+            'number': number,
+            'title': title(),
+            'html_url': html_url,
+            'repository_url': f"https://api.github.com/repos/bench/{repo}",
+            'created_at': created,
+            'updated': created + timedelta(seconds=rng.randint(0, 3600)),
+            'state': state,
+            'merged': state == 'closed' and rng.random() < 0.8,
+            'additions': rng.randint(1, 500),
+            'deletions': rng.randint(0, 200),
+            'user': {'login': author},
+            'commits': [{
+                'oid': f"{number:08x}{index:032x}",
+                'url': f"{html_url}/commits/{number:08x}{index:032x}",
+                'message': title(),
+                'committedDate': created + timedelta(minutes=index),
+                'additions': rng.randint(1, 100),
+                'deletions': rng.randint(0, 50),
+                'author': author
+            } for index in range(rng.randint(1, 4))],
+            'reviews': [{
+                'state': rng.choice(['APPROVED', 'COMMENTED', 'CHANGES_REQUESTED']),
+                'submittedAt': created + timedelta(seconds=rng.randint(0, 3600))
+            }]
+        }
+
+    authored = [pull_request(number, 'bench') for number in range(authored_count)]
+    reviewed = [pull_request(authored_count + number, 'teammate') for number in range(reviewed_count)]
+
+    for items in (issues, authored, reviewed):
+        items.sort(key=lambda item: item['updated'], reverse=True)
+    return {'issues': issues, 'authored': authored, 'reviewed': reviewed}
+
+def jira_time(value: datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+
+def github_time(value: datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class FakeUpstreams:
+    def __init__(self, args):
+        self.args = args
+        self.dataset = build_dataset(args.activities, args.seed)
+        self.requests: Dict[str, int] = {}
+        self.bytes_sent = 0
+        # GraphQL search requests left in the current one-minute window
+        self.search_remaining = args.github_search_limit
+        self.search_reset = time.time() + 60
+        # model -> time it is unloaded, and the last system prompt and prompt it evaluated
+        self.loaded_until: Dict[str, float] = {}
+        self.cached_prompt: Dict[str, str] = {}
+
+    def _count(self, name: str):
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    def _json(self, data, status: int = 200, headers: Dict = None) -> web.Response:
+        body = json.dumps(data).encode('utf-8')
+        self.bytes_sent += len(body)
+        return web.Response(body=body, status=status, content_type='application/json', headers=headers)
+
+    async def _latency(self):
+        if self.args.latency:
+            await asyncio.sleep(self.args.latency)
+
+    # Jira
+
+    async def jira_server_info(self, request: web.Request) -> web.Response:
+        return self._json({
+            'baseUrl': str(request.url.origin()),
+            'version': '9.12.0',
+            'versionNumbers': [9, 12, 0],
+            'deploymentType': 'Server',
+            'buildNumber': 9120000,
+            'serverTitle': 'Benchmark Jira'
+        })
+
+    async def jira_fields(self, request: web.Request) -> web.Response:
+        return self._json([])
+
+    @staticmethod
+    def _jql_bound(jql: str, operator: str):
+        match = re.search(rf'updated\s*{operator}\s*"([^"]+)"', jql)
+        if not match:
+            return None
+        return datetime.strptime(match.group(1), '%Y-%m-%d %H:%M').astimezone(timezone.utc)
+
+    async def jira_search(self, request: web.Request) -> web.Response:
+        self._count('jira_search')
+        await self._latency()
+        jql = request.query.get('jql', '')
+        start_at = int(request.query.get('startAt', 0))
+        max_results = min(int(request.query.get('maxResults', 50)), self.args.jira_max_results)
+
+        since, until = self._jql_bound(jql, '>='), self._jql_bound(jql, '<=')
+        issues = [
+            issue for issue in self.dataset['issues']
+            if (since is None or issue['updated'] >= since) and (until is None or issue['updated'] <= until)
+        ]
+        page = issues[start_at:start_at + max_results]
+        # the jira client sends fields as repeated parameters
+        fields = ','.join(request.query.getall('fields', [])).split(',')
+        expand = request.query.get('expand', '').split(',')
+        return self._json({
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': len(issues),
+            'issues': [self._jira_issue(request, issue, fields, expand) for issue in page]
+        })
+
+    @staticmethod
+    def _jira_issue(request: web.Request, issue: Dict, fields: List[str], expand: List[str]) -> Dict:
+        data = {
+            'id': issue['id'],
+            'key': issue['key'],
+            'self': f"{request.url.origin()}/rest/api/2/issue/{issue['id']}",
+            'fields': {**issue['fields'], 'updated': jira_time(issue['updated'])}
+        }
+        events = list(enumerate(issue['events']))
+        if 'changelog' in expand:
+            histories = [{
+                'id': str(index), 'author': author, 'created': jira_time(when),
+                'items': [{'field': 'status', 'fromString': 'In Progress', 'toString': issue['fields']['status']['name']}]
+            } for index, (kind, author, when) in events if kind == 'status']
+            data['changelog'] = {'startAt': 0, 'maxResults': len(histories), 'total': len(histories), 'histories': histories}
+        if 'comment' in fields:
+            comments = [{
+                'id': str(index), 'author': author, 'created': jira_time(when), 'updated': jira_time(when),
+                'body': f"Looked into {issue['key']}"
+            } for index, (kind, author, when) in events if kind == 'comment']
+            data['fields']['comment'] = {'startAt': 0, 'maxResults': len(comments), 'total': len(comments), 'comments': comments}
+        if 'worklog' in fields:
+            worklogs = [{
+                'id': str(index), 'author': author, 'started': jira_time(when), 'timeSpent': '1h', 'timeSpentSeconds': 3600
+            } for index, (kind, author, when) in events if kind == 'worklog']
+            data['fields']['worklog'] = {'startAt': 0, 'maxResults': len(worklogs), 'total': len(worklogs), 'worklogs': worklogs}
+        return data
+
+    # GitHub
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        return {
+            'X-RateLimit-Limit': str(self.args.github_search_limit),
+            'X-RateLimit-Remaining': str(max(self.search_remaining, 0)),
+            'X-RateLimit-Reset': str(int(self.search_reset)),
+            'X-RateLimit-Resource': 'graphql'
+        }
+
+    def _graphql_node(self, item: Dict) -> Dict:
+        return {
+            'title': item['title'],
+            'url': item['html_url'],
+            'state': 'MERGED' if item['merged'] else item['state'].upper(),
+            'merged': item['merged'],
+            'mergedAt': github_time(item['updated']) if item['merged'] else None,
+            'createdAt': github_time(item['created_at']),
+            'updatedAt': github_time(item['updated']),
+            'additions': item['additions'],
+            'deletions': item['deletions'],
+            'reviewDecision': 'APPROVED' if item['merged'] else 'REVIEW_REQUIRED',
+            'author': {'login': item['user']['login']},
+            'repository': {'name': item['repository_url'].split('/')[-1]},
+            'commits': {'nodes': [{'commit': {
+                **{key: value for key, value in commit.items() if key not in ('committedDate', 'author')},
+                'committedDate': github_time(commit['committedDate']),
+                'author': {'user': {'login': commit['author']}}
+            }} for commit in item['commits']]},
+            'reviews': {'nodes': [
+                {**review, 'submittedAt': github_time(review['submittedAt'])} for review in item['reviews']
+            ]}
+        }
+
+    async def github_graphql(self, request: web.Request) -> web.Response:
+        """Aliased PR searches as sent by GitHubService, paged with offset cursors"""
+        self._count('github_graphql')
+        await self._latency()
+        if time.time() >= self.search_reset:
+            self.search_remaining = self.args.github_search_limit
+            self.search_reset = time.time() + 60
+        if self.search_remaining <= 0:
+            # like GitHub once the quota is spent: 403 with X-RateLimit-Remaining: 0 until the reset
+            self._count('github_rate_limited')
+            return self._json({'message': 'API rate limit exceeded'}, status=403, headers=self._rate_limit_headers())
+        self.search_remaining -= 1
+        payload = await request.json()
+        variables = payload.get('variables', {})
+        first = min(int(variables.get('first', 30)), 100)
+
+        data = {}
+        for alias, index in re.findall(r'(\w+): search\(query: \$q(\d+)', payload.get('query', '')):
+            query = variables[f'q{index}']
+            offset = int(variables.get(f'after{index}') or 0)
+            items = self.dataset['reviewed'] if 'reviewed-by:' in query else self.dataset['authored']
+            match = re.search(r'updated:(\d{4}-\d{2}-\d{2})\.\.(\d{4}-\d{2}-\d{2})', query)
+            if match:
+                since = datetime.strptime(match.group(1), '%Y-%m-%d').replace(tzinfo=timezone.utc)
+                until = datetime.strptime(match.group(2), '%Y-%m-%d').replace(tzinfo=timezone.utc) + timedelta(days=1)
+                items = [item for item in items if since <= item['updated'] < until]
+            available = min(len(items), 1000)
+            data[alias] = {
+                'issueCount': len(items),
+                'pageInfo': {'hasNextPage': offset + first < available, 'endCursor': str(offset + first)},
+                'nodes': [self._graphql_node(item) for item in items[offset:min(offset + first, available)]]
+            }
+        data['rateLimit'] = {'cost': 1, 'remaining': self.search_remaining}
+        return self._json({'data': data}, headers=self._rate_limit_headers())
+
+    # Ollama
+
+    @staticmethod
+    def _keep_alive_seconds(value) -> float:
+        """Ollama's keep_alive: seconds, or a duration like 30m; negative keeps the model loaded"""
+        if value is None:
+            return 300
+        if isinstance(value, str) and value[-1:] in 'smh' and not value.lstrip('-').isdigit():
+            return float(value[:-1]) * {'s': 1, 'm': 60, 'h': 3600}[value[-1]]
+        return float(value)
+
+    async def ollama_generate(self, request: web.Request) -> web.StreamResponse:
+        self._count('ollama_generate')
+        payload = await request.json()
+        model = payload.get('model', 'bench')
+        options = payload.get('options') or {}
+        started = time.perf_counter()
+
+        load_duration = 0.0
+        if self.loaded_until.get(model, 0) < time.monotonic():
+            load_duration = self.args.model_load_time
+            self.cached_prompt.pop(model, None)
+            await asyncio.sleep(load_duration)
+        keep_alive = self._keep_alive_seconds(payload.get('keep_alive'))
+        self.loaded_until[model] = float('inf') if keep_alive < 0 else time.monotonic() + keep_alive
+
+        # like Ollama, only the part after the prefix shared with the previous request is evaluated
+        full_prompt = (payload.get('system') or '') + '\n' + payload.get('prompt', '')
+        cached = self.cached_prompt.get(model, '')
+        shared = 0
+        while shared < min(len(cached), len(full_prompt)) and cached[shared] == full_prompt[shared]:
+            shared += 1
+        self.cached_prompt[model] = full_prompt
+        prompt_tokens = (len(full_prompt) - shared) // 4 + 1
+
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        prompt_started = time.perf_counter()
+        await asyncio.sleep(prompt_tokens / self.args.prompt_eval_rate)
+        prompt_done = time.perf_counter()
+
+        rng = random.Random(len(payload.get('prompt', '')))
+        tokens = ["This Week's Work:\n- Completed Tasks\n"]
+        tokens += [f"{rng.choice(WORDS)} " if index % 12 else f"\n  {index // 12 + 1}. " for index in range(self.args.llm_tokens - 1)]
+        if options.get('num_predict') is not None and options['num_predict'] >= 0:
+            tokens = tokens[:options['num_predict']]
+        try:
+            for token in tokens:
+                await asyncio.sleep(self.args.token_latency)
+                line = {'model': model, 'created_at': github_time(datetime.now(timezone.utc)), 'response': token, 'done': False}
+                await response.write(json.dumps(line).encode('utf-8') + b'\n')
+
+            finished = time.perf_counter()
+            await response.write(json.dumps({
+                'model': model,
+                'created_at': github_time(datetime.now(timezone.utc)),
+                'response': '',
+                'done': True,
+                'total_duration': int((finished - started) * 1e9),
+                'load_duration': int(load_duration * 1e9),
+                'prompt_eval_count': prompt_tokens,
+                'prompt_eval_duration': int((prompt_done - prompt_started) * 1e9),
+                'eval_count': len(tokens),
+                'eval_duration': int((finished - prompt_done) * 1e9)
+            }).encode('utf-8') + b'\n')
+            await response.write_eof()
+        except ConnectionResetError:
+            # the app went away mid-generation, e.g. when the benchmark stops it
+            pass
+        return response
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({'requests': self.requests, 'bytes_sent': self.bytes_sent})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/rest/api/2/serverInfo', self.jira_server_info)
+        app.router.add_get('/rest/api/2/field', self.jira_fields)
+        app.router.add_get('/rest/api/2/search', self.jira_search)
+        app.router.add_post('/graphql', self.github_graphql)
+        app.router.add_post('/api/generate', self.ollama_generate)
+        app.router.add_get('/_bench/stats', self.stats)
+        return app
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Fake Jira, GitHub and Ollama APIs for benchmarking")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--activities', type=int, default=100, help="activities in the synthetic dataset")
+    parser.add_argument('--seed', type=int, default=42, help="seed of the synthetic dataset")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every Jira and GitHub request")
+    parser.add_argument('--jira-max-results', type=int, default=1000, help="largest Jira search page served")
+    parser.add_argument('--github-search-limit', type=int, default=5000, help="GitHub GraphQL search requests allowed per minute")
+    parser.add_argument('--prompt-eval-rate', type=float, default=1000, help="prompt tokens evaluated per second")
+    parser.add_argument('--token-latency', type=float, default=0.01, help="seconds per generated token")
+    parser.add_argument('--llm-tokens', type=int, default=200, help="tokens generated per completion")
+    parser.add_argument('--model-load-time', type=float, default=3, help="seconds to load a model that is not in memory")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    web.run_app(FakeUpstreams(args).app(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,75 @@
+"""Check that importing the web app stays within an import-time budget
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter, prints the
+slowest imports and exits with status 1 when the total exceeds the budget, or when
+one of the modules that should only be loaded on first use (langchain, the jira
+client) is imported eagerly again.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# top-level packages deferred until the services are built
+DEFERRED_PACKAGES = ('langchain', 'langchain_community', 'langchain_core', 'jira')
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """(module, self microseconds, cumulative microseconds) for every import"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr}")
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+def measure(module: str, runs: int) -> Tuple[float, Dict[str, int], List[str]]:
+    """Best total over several runs, cumulative times of the best run and deferred packages it loaded"""
+    best = None
+    for _ in range(runs):
+        times = import_times(module)
+        total = next(cumulative for name, _, cumulative in times if name == module)
+        if best is None or total < best[0]:
+            best = (total, times)
+
+    total, times = best
+    cumulative = {name: value for name, _, value in times}
+    eager = sorted({name.split('.')[0] for name, _, _ in times if name.split('.')[0] in DEFERRED_PACKAGES})
+    return total / 1000, cumulative, eager
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time budget check for the web app")
+    parser.add_argument('--module', default='main', help="module to import")
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_TIME_BUDGET_MS', '800')),
+                        help="largest allowed import time in milliseconds")
+    parser.add_argument('--runs', type=int, default=3, help="imports to run, the fastest one counts")
+    parser.add_argument('--top', type=int, default=15, help="slowest top-level imports to print")
+    args = parser.parse_args()
+
+    total_ms, cumulative, eager = measure(args.module, args.runs)
+    top_level = sorted(
+        ((name, value) for name, value in cumulative.items() if '.' not in name and name != args.module),
+        key=lambda item: item[1], reverse=True
+    )
+    for name, value in top_level[:args.top]:
+        print(f"{value / 1000:>9.1f} ms  {name}")
+    print(f"{total_ms:>9.1f} ms  import {args.module} (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if eager:
+        print(f"FAIL: {', '.join(eager)} imported eagerly, they should load on first use")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import {args.module} took {total_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,357 @@
+"""End-to-end benchmark of /api/generate-report against local fake upstreams
+
+For every dataset size a fresh fake upstream server (benchmarks/fake_upstreams.py)
+and a fresh app process with empty stores are started, then:
+
+- cold: the first report request, a full fetch of every activity, followed by the
+  AI report stream until it finishes (time to first token and total); the model
+  is not loaded yet unless --warm-up lets the app load it at startup
+- warm: a report of another window, not in the LLM cache, on the loaded model
+- load: the same request from several concurrent clients, for throughput and
+  latency percentiles
+- memory: resident and peak resident memory of the app process (Linux), with
+  --workers only of the supervising process
+
+Results are written as JSON named after the commit, so runs on different commits
+can be compared with `python -m benchmarks.run --compare old.json new.json`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def git_commit() -> Dict:
+    def git(*args) -> str:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {'commit': git('rev-parse', 'HEAD') or None, 'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+def memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak resident memory of a process from /proc, None where unavailable"""
+    values = {'rss_mb': None, 'peak_rss_mb': None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    values['rss_mb'] = int(line.split()[1]) / 1024
+                elif line.startswith('VmHWM:'):
+                    values['peak_rss_mb'] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return values
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    def at(fraction: float) -> float:
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000
+    return {
+        'mean': statistics.mean(ordered) * 1000,
+        'p50': at(0.5),
+        'p95': at(0.95),
+        'p99': at(0.99),
+        'max': ordered[-1] * 1000
+    }
+
+async def wait_until_up(session: aiohttp.ClientSession, url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode} before becoming ready")
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+async def wait_for_warm_up(session: aiohttp.ClientSession, base_url: str, timeout: float = 120):
+    """Wait until the app has loaded the model, like a report asked for some time after startup"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        async with session.get(f"{base_url}/api/llm-queue") as response:
+            if response.status == 200 and (await response.json()).get('model_warmed_up_at'):
+                return
+        await asyncio.sleep(0.2)
+    raise RuntimeError("model warm-up did not finish in time")
+
+async def stream_ai_report(session: aiohttp.ClientSession, url: str) -> Dict:
+    """Follow an AI report stream until it ends, timing the first text and the end"""
+    started = time.perf_counter()
+    first_token = None
+    status = 'incomplete'
+    async with session.get(url) as response:
+        async for line in response.content:
+            if line.startswith(b'data:') and first_token is None and b'"text"' in line:
+                first_token = time.perf_counter() - started
+            elif line.startswith(b'event:'):
+                status = line.decode().split(':', 1)[1].strip()
+    return {
+        'first_token_ms': first_token * 1000 if first_token is not None else None,
+        'total_ms': (time.perf_counter() - started) * 1000,
+        'status': status
+    }
+
+async def cold_run(session: aiohttp.ClientSession, base_url: str, query: str = '') -> Dict:
+    started = time.perf_counter()
+    async with session.get(f"{base_url}/api/generate-report{query}") as response:
+        body = await response.read()
+        status = response.status
+    latency = time.perf_counter() - started
+    result = {'status': status, 'latency_ms': latency * 1000, 'response_bytes': len(body)}
+    if status in (200, 202):
+        data = json.loads(body)
+        result['activities'] = data['report']['summary']['total_activities']
+        result['ai_report'] = await stream_ai_report(session, f"{base_url}/api/ai-report/{data['ai_report_id']}/stream")
+    return result
+
+async def load_run(session: aiohttp.ClientSession, base_url: str, clients: int, requests: int) -> Dict:
+    """Send the requests from a fixed number of concurrent clients"""
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                async with session.get(f"{base_url}/api/generate-report") as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {
+        'clients': clients,
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': len(latencies) / elapsed,
+        'latency_ms': percentiles(latencies) if latencies else None
+    }
+
+async def stage_means(session: aiohttp.ClientSession, base_url: str) -> Optional[Dict[str, float]]:
+    """Mean duration per stage from the app's /metrics, when the commit under test has it"""
+    try:
+        async with session.get(f"{base_url}/metrics") as response:
+            if response.status != 200:
+                return None
+            text = await response.text()
+    except aiohttp.ClientError:
+        return None
+    sums, counts = {}, {}
+    for line in text.splitlines():
+        for suffix, target in (('_sum', sums), ('_count', counts)):
+            prefix = f"weeklybot_stage_duration_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                stage = line[len(prefix):line.index('"', len(prefix))]
+                target[stage] = float(line.rsplit(' ', 1)[1])
+    return {stage: sums[stage] / counts[stage] * 1000 for stage in sums if counts.get(stage)}
+
+async def bench_size(args, activities: int) -> Dict:
+    upstream_port, app_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        upstream = subprocess.Popen([
+            sys.executable, '-m', 'benchmarks.fake_upstreams',
+            '--port', str(upstream_port),
+            '--activities', str(activities),
+            '--seed', str(args.seed),
+            '--latency', str(args.upstream_latency),
+            '--github-search-limit', str(args.github_search_limit),
+            '--token-latency', str(args.token_latency),
+            '--llm-tokens', str(args.llm_tokens),
+            '--model-load-time', str(args.model_load_time)
+        ], cwd=ROOT)
+
+        env = {
+            **os.environ,
+            'JIRA_SERVER': upstream_url,
+            'JIRA_API_TOKEN': 'bench',
+            'JIRA_EMAIL': 'bench@example.com',
+            'GITHUB_TOKEN': 'bench',
+            'GITHUB_USERNAME': 'bench',
+            'GITHUB_API_URL': upstream_url,
+            'OLLAMA_API_URL': upstream_url,
+            'OLLAMA_MODEL': 'bench',
+            'ACTIVITY_DB_PATH': os.path.join(data_dir, 'activities.db'),
+            'LLM_CACHE_PATH': os.path.join(data_dir, 'llm_cache.db'),
+            'REPORT_ARCHIVE_PATH': os.path.join(data_dir, 'report_archive.db'),
+            'SHARED_STATE_PATH': os.path.join(data_dir, 'shared_state.db'),
+            'ACTIVITY_REFRESH_INTERVAL': str(args.refresh_interval),
+            'REPORT_SCHEDULER_ENABLED': 'false',
+            'OLLAMA_WARM_UP': 'true' if args.warm_up else 'false',
+            'LOG_LEVEL': 'WARNING'
+        }
+        app = subprocess.Popen([
+            sys.executable, '-m', 'uvicorn', 'main:app',
+            '--host', '127.0.0.1', '--port', str(app_port), '--log-level', 'warning',
+            '--workers', str(args.workers)
+        ], cwd=ROOT, env=env)
+
+        try:
+            timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+            connector = aiohttp.TCPConnector(limit=max(args.clients))
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                await wait_until_up(session, f"{upstream_url}/_bench/stats", upstream)
+                await wait_until_up(session, f"{base_url}/openapi.json", app)
+                startup_memory = memory_mb(app.pid)
+                if args.warm_up:
+                    print(f"[{activities} activities] waiting for the model warm-up", file=sys.stderr)
+                    await wait_for_warm_up(session, base_url)
+
+                print(f"[{activities} activities] cold request", file=sys.stderr)
+                cold = await cold_run(session, base_url)
+                cold_memory = memory_mb(app.pid)
+
+                # a different window is not in the LLM cache, its AI report runs on the loaded model
+                print(f"[{activities} activities] warm model request", file=sys.stderr)
+                now = datetime.now()
+                warm = await cold_run(session, base_url, '?' + urlencode({
+                    'start': (now - timedelta(days=3)).isoformat(timespec='seconds'),
+                    'end': now.isoformat(timespec='seconds')
+                }))
+
+                load = []
+                for clients in args.clients:
+                    print(f"[{activities} activities] {args.requests} requests from {clients} clients", file=sys.stderr)
+                    load.append(await load_run(session, base_url, clients, args.requests))
+
+                async with session.get(f"{upstream_url}/_bench/stats") as response:
+                    upstream_stats = await response.json()
+                return {
+                    'activities': activities,
+                    'cold': cold,
+                    'warm': warm,
+                    'load': load,
+                    'memory': {
+                        'startup_rss_mb': startup_memory['rss_mb'],
+                        'after_cold_rss_mb': cold_memory['rss_mb'],
+                        **memory_mb(app.pid)
+                    },
+                    'stage_mean_ms': await stage_means(session, base_url),
+                    'upstream': upstream_stats
+                }
+        finally:
+            stop(app)
+            stop(upstream)
+
+async def run(args):
+    results = []
+    for activities in args.sizes:
+        results.append(await bench_size(args, activities))
+
+    report = {
+        **git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('compare', 'output')},
+        'results': results
+    }
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results',
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{(report['commit'] or 'unknown')[:10]}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+def summary_metrics(result: Dict) -> Dict[str, Optional[float]]:
+    metrics = {
+        'cold latency ms': result['cold']['latency_ms'],
+        'ai report total ms': (result['cold'].get('ai_report') or {}).get('total_ms'),
+        'ai first token ms': (result['cold'].get('ai_report') or {}).get('first_token_ms'),
+        'warm ai first token ms': ((result.get('warm') or {}).get('ai_report') or {}).get('first_token_ms'),
+        'peak rss mb': result['memory'].get('peak_rss_mb')
+    }
+    for load in result['load']:
+        metrics[f"{load['clients']} clients rps"] = load['throughput_rps']
+        metrics[f"{load['clients']} clients p95 ms"] = (load['latency_ms'] or {}).get('p95')
+    return metrics
+
+def compare(baseline_path: str, candidate_path: str):
+    """Print the headline numbers of two result files side by side"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding='utf-8') as f:
+        candidate = json.load(f)
+    print(f"baseline  {baseline['commit']}  {baseline['timestamp']}")
+    print(f"candidate {candidate['commit']}  {candidate['timestamp']}")
+
+    baseline_results = {result['activities']: result for result in baseline['results']}
+    for result in candidate['results']:
+        old = baseline_results.get(result['activities'])
+        if old is None:
+            continue
+        print(f"\n{result['activities']} activities")
+        old_metrics = summary_metrics(old)
+        for name, value in summary_metrics(result).items():
+            previous = old_metrics.get(name)
+            if value is None or previous is None:
+                continue
+            change = f"{(value - previous) / previous * 100:+.1f}%" if previous else ''
+            print(f"  {name:<24} {previous:>10.1f} {value:>10.1f} {change:>8}")
+
+def parse_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the report service against fake Jira, GitHub and Ollama servers")
+    parser.add_argument('--sizes', type=parse_list, default=[10, 100, 1000, 10000], help="comma separated dataset sizes")
+    parser.add_argument('--clients', type=parse_list, default=[1, 8, 32], help="comma separated concurrent client counts")
+    parser.add_argument('--requests', type=int, default=100, help="requests per concurrency level")
+    parser.add_argument('--seed', type=int, default=42, help="seed of the synthetic datasets")
+    parser.add_argument('--upstream-latency', type=float, default=0.05, help="seconds added to every Jira and GitHub request")
+    parser.add_argument('--github-search-limit', type=int, default=5000, help="GitHub GraphQL search requests allowed per minute")
+    parser.add_argument('--token-latency', type=float, default=0.01, help="seconds per generated LLM token")
+    parser.add_argument('--llm-tokens', type=int, default=200, help="tokens generated per LLM completion")
+    parser.add_argument('--model-load-time', type=float, default=3, help="seconds the fake Ollama takes to load the model")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn worker processes of the app")
+    parser.add_argument('--warm-up', action='store_true', help="let the app load the model at startup and wait for it before the cold request")
+    parser.add_argument('--refresh-interval', type=float, default=0,
+                        help="ACTIVITY_REFRESH_INTERVAL of the app, 0 syncs with the upstreams on every request")
+    parser.add_argument('--request-timeout', type=float, default=600, help="client timeout per request in seconds")
+    parser.add_argument('--output', help="result file (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help="print the headline numbers of two result files instead of running")
+
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(run(args))
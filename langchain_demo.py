@@ -1,15 +1,110 @@
 from langchain_community.llms import Ollama
 from langchain.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough, Runnable, RunnableLambda, RunnableConfig
+from langchain_core.runnables import RunnablePassthrough, Runnable, RunnableLambda, RunnableConfig, RunnableParallel
 from langchain.output_parsers import PydanticOutputParser
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain.memory import ConversationBufferMemory
-from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, get_buffer_string, messages_from_dict, messages_to_dict, trim_messages
+from langchain_core.output_parsers import StrOutputParser
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Sequence
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime
+import json
 import os
+import sqlite3
+import threading
 from dotenv import load_dotenv
 
+# rough token count of chat messages, about 4 characters per token
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    return sum(len(get_buffer_string([message])) // 4 + 1 for message in messages)
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """Chat history of one session, trimmed to its most recent max_tokens"""
+    def __init__(self, session_id: str, max_tokens: int, store: Optional["SessionHistoryStore"] = None,
+                 messages: Optional[List[BaseMessage]] = None):
+        self.session_id = session_id
+        self.max_tokens = max_tokens
+        self.store = store
+        self._messages = list(messages or [])
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return list(self._messages)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        # keep the latest turns that fit the window, starting on a question so no answer is orphaned
+        self._messages = trim_messages(
+            self._messages + list(messages),
+            max_tokens=self.max_tokens,
+            token_counter=estimate_tokens,
+            strategy="last",
+            start_on="human"
+        )
+        if self.store is not None:
+            self.store.save(self.session_id, self._messages)
+
+    def clear(self) -> None:
+        self._messages = []
+        if self.store is not None:
+            self.store.save(self.session_id, [])
+
+class SessionHistoryStore:
+    """Chat histories keyed by session_id, the least recently used evicted beyond max_sessions
+
+    With a db_path the histories are also written to SQLite, so evicted sessions and
+    sessions of earlier runs are loaded back on their next use.
+    """
+    def __init__(self, max_sessions: int = 100, max_tokens: int = 2000, db_path: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.db_path = db_path
+        self.sessions: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+        if self.db_path:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as conn, conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS session_history (
+                        session_id TEXT PRIMARY KEY,
+                        messages TEXT NOT NULL,
+                        updated_at TEXT NOT NULL
+                    )
+                """)
+
+    def _load(self, session_id: str) -> List[BaseMessage]:
+        if not self.db_path:
+            return []
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            row = conn.execute("SELECT messages FROM session_history WHERE session_id = ?", (session_id,)).fetchone()
+        return messages_from_dict(json.loads(row[0])) if row else []
+
+    def save(self, session_id: str, messages: List[BaseMessage]):
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute("""
+                INSERT INTO session_history (session_id, messages, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET messages = excluded.messages, updated_at = excluded.updated_at
+            """, (session_id, json.dumps(messages_to_dict(messages)), datetime.now().isoformat()))
+
+    def get(self, session_id: str) -> BoundedChatMessageHistory:
+        with self.lock:
+            history = self.sessions.get(session_id)
+            if history is None:
+                history = BoundedChatMessageHistory(
+                    session_id, self.max_tokens, self if self.db_path else None, self._load(session_id)
+                )
+                self.sessions[session_id] = history
+            self.sessions.move_to_end(session_id)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+            return history
+
 # Define output model
 class QAOutput(BaseModel):
     answer: str = Field(description="The answer to the question")
@@ -18,36 +113,73 @@ class QAOutput(BaseModel):
     sub_question: List[str] = Field(description="Suggested sub-questions to explore the topic further")
     sub_answer: List[str] = Field(description="Answers to the sub-questions")
 
+class AnswerOutput(BaseModel):
+    answer: str = Field(description="The answer to the question")
+    confidence: float = Field(description="Confidence level of the answer, range 0-1")
+    supporting_points: List[str] = Field(description="Key points supporting the answer")
+
 class QAChain(Runnable):
-    def __init__(self, llm):
-        self.output_parser = PydanticOutputParser(pydantic_object=QAOutput)
+    """Answers the question and each sub-question with separate LLM calls, merged into QAOutput
+
+    The sub-questions are sent as one batch of short prompts while the main answer is
+    generated, so a multi-part answer takes about as long as its slowest part
+    instead of one long generation.
+    """
+    def __init__(self, llm, max_concurrency: int = 4):
+        self.max_concurrency = max_concurrency
+        self.output_parser = PydanticOutputParser(pydantic_object=AnswerOutput)
         self.qa_prompt = PromptTemplate(
-            input_variables=["question", "context"],
+            input_variables=["question", "context", "history"],
             template="""
-            Please answer the following question and sub-questions.
+            Please answer the following question.
+            
+            Conversation so far:
+            {history}
             
             Question:
             {question}
-            Sub-questions:
-            {sub_question}
+            Context:
+            {context}
             
             Please return directly in JSON format, without any comments, explanations, leading words, or Markdown code blocks (like ```json).
             Strictly follow this format:
             {format_instructions}
             """,
             partial_variables={"format_instructions": self.output_parser.get_format_instructions()}
-        )   
-        self.chain = self.qa_prompt | llm | self.output_parser
+        )
+        self.sub_question_prompt = PromptTemplate(
+            input_variables=["question", "sub_question"],
+            template="""
+            While exploring the question "{question}", answer this sub-question in two or three sentences:
+            {sub_question}
+            
+            Return only the answer text, without leading words or Markdown.
+            """
+        )
+        self.answer_chain = self.qa_prompt | llm | self.output_parser
+        self.sub_question_chain = self.sub_question_prompt | llm | StrOutputParser()
+        # an LLM's own batch() generates its prompts one after another, batching a lambda
+        # around the whole chain runs each sub-question in its own thread instead
+        self.sub_question_runner = RunnableLambda(
+            lambda input, config: self.sub_question_chain.invoke(input, config=config)
+        )
+        self.chain = RunnableParallel(
+            main=self.answer_chain,
+            sub_answer=RunnableLambda(self._answer_sub_questions)
+        )
+
+    def _answer_sub_questions(self, input: Dict, config: RunnableConfig) -> List[str]:
+        inputs = [{"question": input["question"], "sub_question": sub_question} for sub_question in input["sub_question"]]
+        answers = self.sub_question_runner.batch(inputs, config={**config, "max_concurrency": self.max_concurrency})
+        return [answer.strip() for answer in answers]
 
     def invoke(self, input, config=None):
-        # print("----------------------------------")
-        # print(input)
         result = self.chain.invoke(input, config=config)
-        # print(result)
-        # print("----------------------------------") 
-        if isinstance(result, BaseModel):
-            return result.dict()
-        return result
+        return QAOutput(
+            **result["main"].dict(),
+            sub_question=input["sub_question"],
+            sub_answer=result["sub_answer"]
+        ).dict()
 
 
 class QuestionRefinementOutput(BaseModel):
@@ -59,13 +191,17 @@ class QuestionRefinementChain(Runnable):
     def __init__(self, llm):
         self.output_parser = PydanticOutputParser(pydantic_object=QuestionRefinementOutput)
         self.refinement_prompt = PromptTemplate(
-            input_variables=["question"],
+            input_variables=["question", "history"],
             template="""
             You are an assistant that helps optimize questions. Your tasks are:
-            1. Optimize the given question to make it clearer and more specific
+            1. Optimize the given question to make it clearer and more specific, resolving references
+               to the conversation so far (like "it") so the question can be understood on its own
             2. Provide additional context
             3. Suggest relevant sub-questions
 
+            Conversation so far:
+            {history}
+
             Original question:
             {question}
 
@@ -89,7 +225,8 @@ class QuestionRefinementChain(Runnable):
 
 
 class LangChainDemo:
-    def __init__(self):
+    def __init__(self, max_sessions: int = 100, history_tokens: int = 2000,
+                 history_db: Optional[str] = None, max_concurrency: int = 4):
         # Load environment variables
         load_dotenv()
         
@@ -104,24 +241,31 @@ class LangChainDemo:
         )
 
         self.qr_chain = QuestionRefinementChain(llm=self.llm)
-        self.qa_chain = QAChain(llm=self.llm)
+        self.qa_chain = QAChain(llm=self.llm, max_concurrency=max_concurrency)
 
         self.composed_chain = (
             RunnablePassthrough.assign(
-                question=lambda x: x["question"]
-            )
-            | self.qr_chain
-            | RunnablePassthrough.assign(
-                question=lambda x: x["refined_question"],
-                sub_question=lambda x: x["suggested_subquestions"]
+                history=lambda x: get_buffer_string(x["history"]) or "(none)"
             )
+            | RunnablePassthrough.assign(refinement=self.qr_chain)
+            | RunnableLambda(lambda x: {
+                "question": x["refinement"]["refined_question"],
+                "context": x["refinement"]["additional_context"],
+                "sub_question": x["refinement"]["suggested_subquestions"],
+                "history": x["history"]
+            })
             | self.qa_chain
         )
 
+        # follow-up questions see the earlier turns of their session
+        self.history_store = SessionHistoryStore(
+            max_sessions, history_tokens, history_db or os.getenv('LANGCHAIN_DEMO_HISTORY_DB')
+        )
         self.memory_chain = RunnableWithMessageHistory(
             self.composed_chain,
-            lambda session_id: InMemoryChatMessageHistory(),  # create a new history for each session, here can also bind session_id
+            self.history_store.get,
             input_messages_key="question",
+            output_messages_key="answer",
             history_messages_key="history"
         )
 
@@ -1,17 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, ORJSONResponse, PlainTextResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.encoders import jsonable_encoder
 from fastapi import Request
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from services.jira_service import JiraService
-from services.github_service import GitHubService
-from services.report_service import ReportService
-from services.ai_report_service import AIReportService
+from typing import Dict, Literal, Optional
+from collections import Counter, OrderedDict
+from services.ai_report_job import AIReportJob, SharedAIReportJob
+from services.activity import ActivityIndex, normalize_activities
+from services.report_archive import parse_period, parse_week, weeks_between
+from services.team_service import load_roster
+from services.scheduler import ReportScheduler
+from services.concurrency import SingleFlight, LLMJobQueue
+from services.metrics import HTTP_REQUEST_DURATION, request_timings, render_metrics, server_timing_header, span
+import asyncio
+import json
 import logging
+import time
 import traceback
+import uuid
 
 # load the environment variables
 load_dotenv()
@@ -37,65 +48,475 @@ logger = logging.getLogger(__name__)
 # record the current log level
 logger.info(f"Log level set to: {LOG_LEVEL}")
 
-app = FastAPI(title="AI Weekly Report Generator")
+app = FastAPI(title="AI Weekly Report Generator", default_response_class=ORJSONResponse)
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZip responses except server-sent events, which must reach the browser unbuffered"""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024)
 
 # mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# initialize services
-try:
+# per-source fetch timeouts in seconds
+JIRA_TIMEOUT = float(os.getenv('JIRA_TIMEOUT', '30'))
+GITHUB_TIMEOUT = float(os.getenv('GITHUB_TIMEOUT', '30'))
+
+# days covered by a report, the window starts at midnight so that reports generated
+# during the same day share the same activities (and the same cached AI report)
+REPORT_WINDOW_DAYS = int(os.getenv('REPORT_WINDOW_DAYS', '14'))
+
+# how long a finished AI report stays available for polling, in seconds
+AI_REPORT_RETENTION = float(os.getenv('AI_REPORT_RETENTION', '600'))
+
+# AI reports being generated in the background, keyed by report id
+ai_report_jobs = {}
+
+# unfinished AI reports keyed by their content key, identical requests share one job
+ai_report_jobs_by_key = {}
+
+# requests beyond the LLM queue size (and its waiting room) are rejected
+LLM_QUEUE_MAX_WAITING = int(os.getenv('LLM_QUEUE_MAX_WAITING', '32'))
+
+# concurrent refreshes of the same report window share one fetch
+activity_flight = SingleFlight()
+
+# normalized activities of the latest report windows, indexed for /api/activities
+# and keyed like activity_flight, least recently used first
+ACTIVITY_INDEX_WINDOWS = 8
+activity_indexes = OrderedDict()
+
+# team report runs, keyed by job id
+team_report_jobs = {}
+
+# background pre-generation, started with the app
+report_scheduler = None
+
+llm_queue = LLMJobQueue(
+    int(os.getenv('OLLAMA_CONCURRENCY', '1')),
+    int(os.getenv('LLM_QUEUE_SIZE', '8'))
+)
+
+# services are built on first use, or by the warm-up started with the app, so the server
+# answers right away; a failed build is retried once SERVICE_RETRY_INTERVAL seconds have passed
+SERVICE_RETRY_INTERVAL = float(os.getenv('SERVICE_RETRY_INTERVAL', '30'))
+services_initialized = False
+services_error = None
+services_failed_at = 0.0
+services_lock = asyncio.Lock()
+
+def build_services():
+    """Import and construct the services, this is where langchain and the jira client get loaded"""
+    global jira_service, github_service, report_service, ai_report_service, activity_store, report_archive, team_report_service, shared_state
+    from services.jira_service import JiraService
+    from services.github_service import GitHubService
+    from services.report_service import ReportService
+    from services.ai_report_service import AIReportService
+    from services.activity_store import ActivityStore
+    from services.report_archive import ReportArchive
+    from services.team_service import TeamReportService
+    from services.shared_state import SQLiteSharedState
+    
+    shared_state = SQLiteSharedState()
     jira_service = JiraService()
     github_service = GitHubService()
     report_service = ReportService()
     ai_report_service = AIReportService()
-    services_initialized = True
-    logger.info("Services initialized successfully")
-except Exception as e:
-    logger.error(f"Service initialization failed: {str(e)}")
-    logger.error(traceback.format_exc())
-    services_initialized = False
+    activity_store = ActivityStore(shared_state=shared_state)
+    report_archive = ReportArchive()
+    team_report_service = TeamReportService(jira_service, github_service, report_service, ai_report_service, llm_queue)
+
+async def ensure_services():
+    """Build the services if that has not happened yet, raising 503 while they are unavailable"""
+    global services_initialized, services_error, services_failed_at
+    if services_initialized:
+        return
+    async with services_lock:
+        if services_initialized:
+            return
+        if services_error is not None and time.monotonic() - services_failed_at < SERVICE_RETRY_INTERVAL:
+            raise HTTPException(status_code=503, detail=f"Services not properly initialized: {services_error}")
+        
+        started = time.perf_counter()
+        try:
+            # imports and constructors block, keep the event loop serving meanwhile
+            await asyncio.to_thread(build_services)
+        except Exception as e:
+            services_error = str(e)
+            services_failed_at = time.monotonic()
+            logger.error(f"Service initialization failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            raise HTTPException(status_code=503, detail=f"Services not properly initialized: {services_error}")
+        services_initialized = True
+        services_error = None
+        logger.info(f"Services initialized successfully in {time.perf_counter() - started:.2f}s")
+
+async def warm_up():
+    """Build the services and connect to Jira in the background right after startup"""
+    try:
+        await ensure_services()
+        await asyncio.to_thread(lambda: jira_service.jira)
+    except HTTPException:
+        pass
+    except Exception as e:
+        logger.warning(f"Warm-up could not connect to Jira, will retry on first use: {str(e)}")
+
+async def warm_up_model(reason: str):
+    """Load the Ollama model ahead of the first report, queued behind any other generation"""
+    try:
+        await ensure_services()
+        await llm_queue.run(llm_queue.BACKGROUND, ai_report_service.warm_up)
+    except Exception as e:
+        logger.warning(f"{reason.capitalize()} model warm-up failed: {str(e)}")
+
+@app.on_event("startup")
+async def startup():
+    global report_scheduler
+    llm_queue.start()
+    asyncio.create_task(warm_up())
+    if os.getenv('OLLAMA_WARM_UP', 'true').lower() == 'true':
+        asyncio.create_task(warm_up_model('startup'))
+    if os.getenv('REPORT_SCHEDULER_ENABLED', 'true').lower() == 'true':
+        report_scheduler = ReportScheduler(pregenerate_report, warm_up_model)
+        report_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if report_scheduler is not None:
+        await report_scheduler.stop()
+    await llm_queue.stop()
+    if services_initialized:
+        await github_service.close()
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Time every request and report its stages in a Server-Timing header"""
+    timings = []
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    duration = time.perf_counter() - start
+    # label by route template so that ids in the path do not create a series each
+    route = request.scope.get('route')
+    HTTP_REQUEST_DURATION.observe(
+        duration, method=request.method, route=getattr(route, 'path', 'unmatched'), status=response.status_code
+    )
+    response.headers['Server-Timing'] = server_timing_header(timings + [('total', duration)])
+    return response
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.get("/api/generate-report")
-async def generate_report():
-    if not services_initialized:
-        logger.error("Services not properly initialized")
-        raise HTTPException(
-            status_code=503,
-            detail="Services not properly initialized. Please ensure all required environment variables are configured."
+async def sync_source(name: str, source: str, fetch, start_date: datetime, end_date: datetime,
+                      timeout: float, id_key: str, updated_key: str, date_key: str) -> tuple:
+    """Refresh a source incrementally and return its stored activities for the date range
+
+    When the source fails or times out, the activities already in the store are used
+    and a warning for the report is returned alongside them.
+    """
+    warning = None
+    try:
+        with span(name.lower()):
+            await asyncio.wait_for(
+                activity_store.sync(source, fetch, start_date, end_date, id_key, updated_key, date_key),
+                timeout=timeout
+            )
+    except asyncio.TimeoutError:
+        logger.error(f"Fetching {name} data timed out after {timeout}s, using stored activities")
+        warning = f"{name} did not respond in time, showing previously fetched {name} activities"
+    except Exception as e:
+        logger.error(f"Error fetching {name} data: {str(e)}, using stored activities")
+        warning = f"{name} is unavailable ({str(e)}), showing previously fetched {name} activities"
+    with span('store_read'):
+        return await asyncio.to_thread(activity_store.get_activities, source, start_date, end_date), warning
+
+def report_window() -> tuple:
+    end_date = datetime.now()
+    start_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=REPORT_WINDOW_DAYS)
+    return start_date, end_date
+
+def local_time(value: datetime) -> datetime:
+    """Naive local time, like the datetime.now() the store and the report windows use"""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+def resolve_window(week: Optional[str], start: Optional[datetime], end: Optional[datetime]) -> tuple:
+    """Start, end and flight key of the requested window, raising ValueError for invalid parameters
+
+    Without parameters this is the rolling REPORT_WINDOW_DAYS window. A window that
+    runs until now is keyed without its end, so requests made moments apart share it.
+    """
+    if week:
+        if start or end:
+            raise ValueError("Give either week or start/end, not both")
+        start_date, end_date = parse_week(week)
+        return start_date, end_date, (start_date, end_date)
+    default_start, now = report_window()
+    start_date = local_time(start) if start else default_start
+    end_date = local_time(end) if end else now
+    if start_date >= end_date:
+        raise ValueError("start must be before end")
+    return start_date, end_date, (start_date, end_date if end else None)
+
+def activity_sources() -> tuple:
+    return f"jira:{jira_service.current_user}", f"github:{github_service.username}"
+
+def archive_user() -> str:
+    """User the report archive is indexed by"""
+    return jira_service.current_user
+
+def remember_index(key, activities: list) -> ActivityIndex:
+    """Index the activities of a window for /api/activities, keeping the most recent windows"""
+    index = activity_indexes[key] = ActivityIndex(activities)
+    activity_indexes.move_to_end(key)
+    while len(activity_indexes) > ACTIVITY_INDEX_WINDOWS:
+        activity_indexes.popitem(last=False)
+    return index
+
+async def collect_activities(start_date: datetime, end_date: datetime, key) -> tuple:
+    """Refresh both sources and return the normalized activities, warnings, data freshness and activity index"""
+    jira_source, github_source = activity_sources()
+    
+    # refresh jira and github data concurrently, only fetching what changed since the last sync
+    (jira_data, jira_warning), (github_data, github_warning) = await asyncio.gather(
+        sync_source("Jira", jira_source, jira_service.fetch_activities,
+                    start_date, end_date, JIRA_TIMEOUT, 'key', 'updated', 'updated'),
+        sync_source("GitHub", github_source, github_service.fetch_activities,
+                    start_date, end_date, GITHUB_TIMEOUT, 'url', 'updated', 'date')
+    )
+    logger.info(f"Retrieved {len(jira_data)} Jira tasks")
+    logger.info(f"Retrieved {len(github_data)} GitHub activities")
+    
+    # the report is as fresh as the least recently synced source
+    states = await asyncio.gather(
+        asyncio.to_thread(activity_store.get_sync_state, jira_source),
+        asyncio.to_thread(activity_store.get_sync_state, github_source)
+    )
+    sync_times = [state['synced_at'] for state in states if state]
+    fresh_as_of = min(sync_times).isoformat() if len(sync_times) == 2 else None
+    
+    # normalize both sources once, both reports use the same merged list
+    with span('normalize'):
+        activities = normalize_activities(jira_data, github_data)
+        index = remember_index(key, activities)
+    warnings = [warning for warning in (jira_warning, github_warning) if warning]
+    return activities, warnings, fresh_as_of, index
+
+async def load_window(start_date: datetime, end_date: datetime, key, week: Optional[str] = None) -> tuple:
+    """Activities, warnings and freshness of a window, the archived week it was served from and its index
+
+    A completed week that is in the report archive is served from it without
+    contacting Jira or GitHub; every other window is refreshed through the store.
+    The index is returned rather than looked up, concurrent requests for other
+    windows may already have evicted it from activity_indexes.
+    """
+    if week and end_date < datetime.now():
+        with span('archive_read'):
+            archived = await asyncio.to_thread(report_archive.get_week, archive_user(), week)
+        if archived is not None:
+            index = remember_index(key, archived['activities'])
+            return archived['activities'], [], archived['archived_at'].isoformat(), archived, index
+    
+    # identical requests arriving together share one refresh
+    activities, warnings, fresh_as_of, index = await activity_flight.do(
+        key, lambda: collect_activities(start_date, end_date, key)
+    )
+    return activities, warnings, fresh_as_of, None, index
+
+def archive_from_store(week: str) -> Optional[Dict]:
+    """Archive a completed week from the activity store, if the store fully covers it
+
+    Nothing is fetched, so this is cheap enough to fill in the history of every
+    week the scheduler has already synced.
+    """
+    start_date, end_date = parse_week(week)
+    sources = activity_sources()
+    if not all(activity_store.covers(source, start_date, end_date) for source in sources):
+        return None
+    activities = normalize_activities(*(activity_store.get_activities(source, start_date, end_date) for source in sources))
+    report = report_service.generate_report(activities, include_activities=False)
+    report_archive.save_week(archive_user(), week, report, activities)
+    return {'week': week, 'report': report, 'activities': activities, 'ai_report': None, 'archived_at': datetime.now()}
+
+def archive_completed_weeks(start_date: datetime, end_date: datetime) -> list:
+    """Archive the completed weeks inside the date range that are not archived yet"""
+    now = datetime.now()
+    weeks = [
+        week for week in weeks_between(start_date, end_date)
+        if parse_week(week)[0] >= start_date and parse_week(week)[1] < now
+    ]
+    archived = report_archive.get_weeks(archive_user(), weeks)
+    return [week for week in weeks if week not in archived and archive_from_store(week) is not None]
+
+async def pregenerate_report(reason: str):
+    """Scheduler job: refresh the activity store, archive completed weeks and warm the AI report cache
+
+    Every worker runs the scheduler; one at a time does the work, the others then find
+    the store fresh and the report cached.
+    """
+    await ensure_services()
+    async with shared_state.lease('pregenerate'):
+        start_date, end_date = report_window()
+        activities, _, _, _ = await activity_flight.do(
+            (start_date, None), lambda: collect_activities(start_date, end_date, (start_date, None))
         )
+        archived = await asyncio.to_thread(archive_completed_weeks, start_date, end_date)
+        if archived:
+            logger.info(f"Archived completed weeks {', '.join(archived)}")
+        if await ai_report_service.is_cached(activities):
+            return
+        # lowest priority, interactive reports waiting in the queue go first. Started like an
+        # interactive report, so a request for the same activities joins it instead of generating again
+        job, _ = await start_ai_report(activities, priority=llm_queue.BACKGROUND)
+        async for _ in job.stream():
+            pass
+
+async def run_ai_report(job: AIReportJob, report_key: str, activities: list, on_done=None):
+    """Generate the AI report, hand the finished text to on_done and expire the job after the retention period"""
+    try:
+        with span('llm'):
+            await job.run(ai_report_service.stream_ai_report(activities))
+        if on_done is not None and job.error is None:
+            await asyncio.to_thread(on_done, job.text)
+    finally:
+        if ai_report_jobs_by_key.get(report_key) is job:
+            del ai_report_jobs_by_key[report_key]
+        asyncio.get_running_loop().call_later(AI_REPORT_RETENTION, ai_report_jobs.pop, job.report_id, None)
+
+async def track_ai_report(job: AIReportJob, report_key: Optional[str] = None, claimed: bool = False):
+    """Register a job of this worker, and publish it (with its claim on report_key) so that every worker can serve it"""
+    ai_report_jobs[job.report_id] = job
+    if report_key is not None:
+        ai_report_jobs_by_key[report_key] = job
+    await job.share(shared_state, AI_REPORT_RETENTION, report_key if claimed else None)
+
+async def replay_ai_report(job: AIReportJob, text: str):
+    async def chunks():
+        yield text
+    await job.run(chunks())
+    asyncio.get_running_loop().call_later(AI_REPORT_RETENTION, ai_report_jobs.pop, job.report_id, None)
+
+async def start_ai_report(activities: list, on_done=None, archived_text: Optional[str] = None,
+                          priority: Optional[int] = None) -> tuple:
+    """Start the AI report of an activity set, or join the identical one already in progress
+
+    Archived and cached reports are served straight away; everything else goes
+    through the LLM queue, at interactive priority unless another one is given.
+    When the queue is full the job waits for room, and when the waiting room is
+    full too an interactive request is rejected. A report another worker is
+    already generating is followed through the shared state instead. Returns the job
+    and whether it is waiting.
+    """
+    if archived_text is not None:
+        job = AIReportJob(uuid.uuid4().hex)
+        await track_ai_report(job)
+        asyncio.create_task(replay_ai_report(job, archived_text))
+        return job, False
+    
+    # formatting the activities and the cache lookup stay off the event loop
+    report_key = await asyncio.to_thread(ai_report_service.report_key, activities)
+    cached = await asyncio.to_thread(ai_report_service.cache.contains, report_key)
+    job = ai_report_jobs_by_key.get(report_key)
+    if job is not None:
+        logger.info(f"Joining in-flight AI report {job.report_id}")
+        return job, False
+    
+    waiting = claimed = False
+    if cached:
+        job = AIReportJob(uuid.uuid4().hex)
+        asyncio.create_task(run_ai_report(job, report_key, activities, on_done))
+    else:
+        if priority is None and llm_queue.queue.full() and llm_queue.waiting >= LLM_QUEUE_MAX_WAITING:
+            raise HTTPException(status_code=503, detail="Too many AI reports in progress, please try again later")
+        job = AIReportJob(uuid.uuid4().hex)
+        # only one worker generates a report, the claim expires if that worker dies
+        claim = await asyncio.to_thread(
+            shared_state.put_if_absent, 'ai_report_key', report_key, {'report_id': job.report_id}, shared_state.lease_ttl
+        )
+        if claim['report_id'] != job.report_id:
+            logger.info(f"Joining AI report {claim['report_id']} of another worker")
+            record = await asyncio.to_thread(shared_state.get, 'ai_report', claim['report_id']) or job.to_record()
+            return SharedAIReportJob(claim['report_id'], shared_state, record), False
+        claimed = True
+        generate = lambda: run_ai_report(job, report_key, activities, on_done)
+        priority = llm_queue.INTERACTIVE if priority is None else priority
+        try:
+            llm_queue.submit_nowait(priority, generate)
+        except asyncio.QueueFull:
+            logger.warning(f"LLM queue full, AI report {job.report_id} waiting for room")
+            asyncio.create_task(llm_queue.submit(priority, generate))
+            waiting = True
+    
+    await track_ai_report(job, report_key, claimed)
+    return job, waiting
+
+@app.get("/api/generate-report")
+async def generate_report(
+    include_activities: bool = False,
+    week: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Report of the rolling window, an ISO week (`week=2024-W07`) or a `start`/`end` range
+
+    Completed weeks are archived on first generation and served from the archive afterwards.
+    """
+    await ensure_services()
+    try:
+        start_date, end_date, key = resolve_window(week, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     try:
-        # get the date range of the past week
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=14)
-        
         logger.info(f"Starting report generation, time range: {start_date} to {end_date}")
         
-        # get jira and github data
-        jira_data = await jira_service.get_weekly_activities(start_date, end_date)
-        logger.info(f"Retrieved {len(jira_data)} Jira tasks")
+        activities, warnings, fresh_as_of, archived, _ = await load_window(start_date, end_date, key, week)
         
-        github_data = await github_service.get_weekly_activities(start_date, end_date)
-        logger.info(f"Retrieved {len(github_data)} GitHub activities")
+        # return the regular report right away, the AI report is generated in the background
+        # (or served from the archive or the cache when it was generated before)
+        with span('report'):
+            regular_report = report_service.generate_report(activities, include_activities)
         
-        # generate both regular and AI-enhanced reports
-        regular_report = report_service.generate_report(jira_data, github_data)
-        ai_report = ai_report_service.generate_ai_report(jira_data, github_data)
+        on_done = None
+        if week and end_date < datetime.now():
+            user = archive_user()
+            # only archive complete data, a week fetched while a source was down is fetched again next time
+            if archived is None and not warnings:
+                with span('archive_write'):
+                    await asyncio.to_thread(report_archive.save_week, user, week, regular_report, activities)
+            if archived is not None or not warnings:
+                on_done = lambda text: report_archive.save_ai_report(user, week, text)
+        job, waiting = await start_ai_report(activities, on_done, archived and archived['ai_report'])
         
         # logger.info(f"Regular report: {regular_report}")    
-        logger.info(f"AI report: {ai_report['ai_report']}")
-        logger.info("Reports generated successfully")
+        logger.info(f"Regular report generated successfully, AI report {job.report_id} {job.state}")
         
-        return {
-            "status": "success",
-            "report": regular_report,
-            "ai_report": ai_report['ai_report']
-        }
+        # 202 tells the client the AI report is waiting for room in the LLM queue
+        return ORJSONResponse(
+            status_code=202 if waiting else 200,
+            content={
+                "status": "success",
+                "report": regular_report,
+                "start": start_date.isoformat(),
+                "end": end_date.isoformat(),
+                "archived": archived is not None,
+                "ai_report_id": job.report_id,
+                "ai_report_status": job.state,
+                "fresh_as_of": fresh_as_of,
+                "warnings": warnings
+            }
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating report: {str(e)}")
         logger.error(traceback.format_exc())
@@ -104,6 +525,279 @@ async def generate_report():
             detail=f"Error generating report: {str(e)}"
         )
 
+@app.get("/api/activities")
+async def get_activities(
+    type: Optional[Literal['jira', 'github']] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    week: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500)
+):
+    """One page of the activities of the rolling window or of an ISO week, newest first
+
+    `start`/`end` filter inside the window. Follow `next_cursor` to get the next page;
+    it is null on the last one.
+    """
+    await ensure_services()
+    try:
+        start_date, end_date, key = resolve_window(week, None, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    index = activity_indexes.get(key)
+    if index is None:
+        *_, index = await load_window(start_date, end_date, key, week)
+    
+    try:
+        activities, next_cursor, total = index.page(
+            type,
+            # naive times are local, like the window of /api/generate-report
+            local_time(start) if start else None,
+            local_time(end) if end else None,
+            cursor,
+            limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "activities": [activity.to_dict() for activity in activities],
+        "next_cursor": next_cursor,
+        "total": total
+    }
+
+def resolve_weeks(period: Optional[str], start_week: Optional[str], end_week: Optional[str]) -> list:
+    """ISO weeks of a retrospective, raising ValueError for invalid parameters"""
+    if period:
+        if start_week or end_week:
+            raise ValueError("Give either period or start_week/end_week, not both")
+        return weeks_between(*parse_period(period))
+    if not (start_week and end_week):
+        raise ValueError("Give a period (2024-Q3, 2024-H2) or start_week and end_week")
+    first, last = parse_week(start_week)[0], parse_week(end_week)[1]
+    if first > last:
+        raise ValueError("start_week must not be after end_week")
+    return weeks_between(first, last)
+
+def load_archived_weeks(weeks: list) -> Dict[str, Dict]:
+    """Archived weeks, archiving from the store the ones it fully covers"""
+    archived = report_archive.get_weeks(archive_user(), weeks)
+    for week in weeks:
+        if week not in archived:
+            stored = archive_from_store(week)
+            if stored is not None:
+                archived[week] = stored
+    return archived
+
+@app.get("/api/retrospective")
+async def retrospective(
+    period: Optional[str] = None,
+    start_week: Optional[str] = None,
+    end_week: Optional[str] = None,
+    include_activities: bool = False,
+    ai: bool = False
+):
+    """Quarter, half-year or week-range report aggregated from the archived weeks
+
+    Jira and GitHub are not contacted: weeks that are neither archived nor covered by
+    the activity store are listed in `missing_weeks` (generate them with
+    `/api/generate-report?week=...`), and weeks that have not ended yet are left out.
+    """
+    await ensure_services()
+    try:
+        weeks = resolve_weeks(period, start_week, end_week)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    now = datetime.now()
+    completed = [week for week in weeks if parse_week(week)[1] < now]
+    
+    with span('archive_read'):
+        archived = await asyncio.to_thread(load_archived_weeks, completed)
+    
+    # an issue worked on over several weeks appears in each of them, keep its latest state
+    latest = {}
+    for week in completed:
+        for activity in archived.get(week, {}).get('activities', []):
+            known = latest.get((activity.source, activity.key))
+            if known is None or activity.date > known.date:
+                latest[(activity.source, activity.key)] = activity
+    activities = sorted(latest.values(), key=lambda activity: activity.date, reverse=True)
+    
+    with span('report'):
+        report = report_service.generate_report(activities, include_activities)
+    groups = Counter(activity.group for activity in activities)
+    
+    content = {
+        "status": "success",
+        "weeks": [
+            {"week": week, "summary": archived[week]['report']['summary'], "has_ai_report": archived[week]['ai_report'] is not None}
+            for week in completed if week in archived
+        ],
+        "missing_weeks": [week for week in completed if week not in archived],
+        "pending_weeks": [week for week in weeks if week not in completed],
+        "report": report,
+        "top_groups": [{"group": group, "count": count} for group, count in groups.most_common(10)]
+    }
+    if ai and activities:
+        job, _ = await start_ai_report(activities)
+        content.update(ai_report_id=job.report_id, ai_report_status=job.state)
+    return content
+
+@app.get("/api/archive/weeks")
+async def get_archived_weeks():
+    """Summaries of the archived weeks, newest first"""
+    await ensure_services()
+    return {"weeks": await asyncio.to_thread(report_archive.list_weeks, archive_user())}
+
+async def get_ai_report_job(report_id: str):
+    """A job of this worker, or one published by another worker"""
+    job = ai_report_jobs.get(report_id)
+    if job is not None:
+        return job
+    await ensure_services()
+    record = await asyncio.to_thread(shared_state.get, 'ai_report', report_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="AI report not found or expired")
+    return SharedAIReportJob(report_id, shared_state, record)
+
+@app.get("/api/ai-report/{report_id}")
+async def get_ai_report(report_id: str):
+    job = await get_ai_report_job(report_id)
+    
+    if job.error is not None:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating AI report: {job.error}"
+        )
+    
+    return {
+        "status": "success" if job.done else ("queued" if job.state == 'queued' else "pending"),
+        "ai_report": job.text
+    }
+
+@app.get("/api/ai-report/{report_id}/stream")
+async def stream_ai_report(report_id: str):
+    """Server-sent events with the AI report text as the model produces it"""
+    job = await get_ai_report_job(report_id)
+    
+    async def events():
+        async for chunk in job.stream():
+            yield f"data: {json.dumps({'text': chunk})}\n\n"
+        if job.error is not None:
+            yield f"event: failed\ndata: {json.dumps({'detail': job.error})}\n\n"
+        else:
+            yield "event: done\ndata: {}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/llm-cache")
+async def get_llm_cache():
+    """Size, limits and hit rate of the AI report cache"""
+    await ensure_services()
+    return await asyncio.to_thread(ai_report_service.cache.stats)
+
+@app.delete("/api/llm-cache")
+async def clear_llm_cache():
+    await ensure_services()
+    removed = await asyncio.to_thread(ai_report_service.cache.clear)
+    logger.info(f"Cleared {removed} LLM cache entries")
+    return {"status": "success", "removed": removed}
+
+@app.get("/api/llm-queue")
+async def get_llm_queue():
+    """Jobs waiting for and running on the LLM"""
+    await ensure_services()
+    warmed_up_at = ai_report_service.warmed_up_at
+    return {
+        **llm_queue.stats(),
+        "max_waiting": LLM_QUEUE_MAX_WAITING,
+        "model_warmed_up_at": warmed_up_at.isoformat() if warmed_up_at else None
+    }
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the server is up, whatever the state of Jira, GitHub and the model"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the services are built, checking also retries a failed initialization"""
+    try:
+        await ensure_services()
+    except HTTPException as e:
+        return ORJSONResponse(status_code=503, content={"status": "unavailable", "detail": e.detail})
+    return {"status": "ready", "llm_queue": llm_queue.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latencies, upstream traffic and LLM token counters in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.post("/api/team/reports")
+async def generate_team_reports(days: int = 14):
+    """Start building reports for everyone in the team roster"""
+    await ensure_services()
+    
+    try:
+        members = load_roster()
+    except Exception as e:
+        logger.error(f"Error loading team roster: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Error loading team roster: {str(e)}")
+    
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    job_id = uuid.uuid4().hex
+    job = {"status": "pending", "total": len(members), "reports": []}
+    team_report_jobs[job_id] = job
+    
+    publishing = asyncio.Lock()
+    
+    async def publish():
+        # polls may reach any worker; reports hold datetimes, store them as the API returns them.
+        # One write at a time, each with the job as it is then, so the last one written is the latest
+        async with publishing:
+            try:
+                await asyncio.to_thread(shared_state.put, 'team_report', job_id, jsonable_encoder(job), AI_REPORT_RETENTION)
+            except Exception as e:
+                logger.error(f"Error publishing team report job {job_id}: {str(e)}")
+    
+    def on_report(report: Dict):
+        job["reports"].append(report)
+        asyncio.create_task(publish())
+    
+    async def run():
+        try:
+            await team_report_service.generate_team_reports(members, start_date, end_date, on_report)
+            job["status"] = "success"
+        except Exception as e:
+            logger.error(f"Error generating team reports: {str(e)}")
+            logger.error(traceback.format_exc())
+            job["status"] = "error"
+            job["detail"] = str(e)
+        finally:
+            await publish()
+            asyncio.get_running_loop().call_later(AI_REPORT_RETENTION, team_report_jobs.pop, job_id, None)
+    
+    await publish()
+    
+    asyncio.create_task(run())
+    logger.info(f"Team report job {job_id} started for {len(members)} members")
+    return {"status": "accepted", "job_id": job_id, "total": len(members)}
+
+@app.get("/api/team/reports/{job_id}")
+async def get_team_reports(job_id: str):
+    job = team_report_jobs.get(job_id)
+    if job is None:
+        await ensure_services()
+        job = await asyncio.to_thread(shared_state.get, 'team_report', job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Team report job not found or expired")
+    return {**job, "completed": len(job["reports"])}
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # workers share the stores, the LLM cache and in-flight jobs through the shared state
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=int(os.getenv('WEB_WORKERS', '1'))) 
\ No newline at end of file
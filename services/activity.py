@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from operator import attrgetter
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+import base64
+import bisect
+import heapq
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def parse_timestamp(value) -> datetime:
+    """Parse a Jira or GitHub ISO timestamp into a timezone-aware datetime, raising ValueError if invalid"""
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str):
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    else:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+@dataclass(slots=True)
+class Activity:
+    """A Jira or GitHub activity, normalized once when it is fetched"""
+    source: str           # 'jira' or 'github'
+    kind: str             # Jira issue type or event ('Status Change' / 'Comment' / 'Work Log'),
+                          # or 'pull_request' / 'review' / 'commit'
+    date: datetime
+    key: str              # Jira issue key (ABC-1#comment-10 for events) or GitHub URL
+    title: str
+    status: str
+    group: str            # Jira project or GitHub repository
+    url: Optional[str] = None
+    additions: Optional[int] = None   # lines changed by a GitHub PR or commit
+    deletions: Optional[int] = None
+    detail: Optional[str] = None      # Jira event: status change, comment excerpt or time logged
+    parent: Optional[str] = None      # PR of a GitHub commit
+
+    @property
+    def issue_key(self) -> str:
+        """Jira issue key without the event suffix"""
+        return self.key.split('#', 1)[0]
+
+    def _github_details(self) -> str:
+        """State and lines changed appended to GitHub texts, e.g. (merged, +120/-30)"""
+        details = [self.status] if self.status else []
+        if self.additions is not None and self.deletions is not None:
+            details.append(f"+{self.additions}/-{self.deletions}")
+        return f" ({', '.join(details)})" if details else ""
+
+    def report_content(self) -> str:
+        """Text shown in the regular report"""
+        if self.source == 'jira':
+            return f"{self.kind}: {self.issue_key} - {self.title} ({self.detail or self.status})"
+        return f"{self.kind}: {self.group} - {self.title}{self._github_details()}"
+
+    def to_dict(self) -> Dict:
+        return {
+            'type': self.source,
+            'date': self.date,
+            'content': self.report_content()
+        }
+
+    def to_record(self) -> Dict:
+        """Every field in JSON-serializable form, for the report archive"""
+        return {**{name: getattr(self, name) for name in self.__slots__}, 'date': self.date.isoformat()}
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'Activity':
+        return cls(**{**record, 'date': parse_timestamp(record['date'])})
+
+def from_jira(item: Dict) -> Activity:
+    return Activity(
+        source='jira',
+        kind=item['type'],
+        date=parse_timestamp(item['updated']),
+        key=item['key'],
+        title=item['summary'],
+        status=item['status'],
+        group=item['key'].split('-')[0],
+        detail=item.get('detail')
+    )
+
+def from_github(item: Dict) -> Activity:
+    return Activity(
+        source='github',
+        kind=item['type'],
+        date=parse_timestamp(item['date']),
+        key=item['url'],
+        title=item['message'] if item['type'] == 'commit' else item['title'],
+        status=item.get('state', ''),
+        group=item['repo'],
+        url=item['url'],
+        additions=item.get('additions'),
+        deletions=item.get('deletions'),
+        parent=item.get('pull_request')
+    )
+
+def _normalize(items: Iterable[Dict], converter, source: str) -> Iterator[Activity]:
+    for item in items:
+        try:
+            yield converter(item)
+        except (KeyError, ValueError) as e:
+            # skip broken items instead of giving them a made-up date
+            logger.warning(f"Skipping invalid {source} activity {item.get('key') or item.get('url')}: {str(e)}")
+
+def merge_activities(*streams: Iterable[Activity]) -> Iterator[Activity]:
+    """Lazily merge activity streams that are each sorted newest first"""
+    return heapq.merge(*streams, key=attrgetter('date'), reverse=True)
+
+def normalize_activities(jira_data: List[Dict], github_data: List[Dict]) -> List[Activity]:
+    """Normalize both sources and merge them into one newest-first list
+
+    Each source already arrives sorted by date, so they are combined with a k-way
+    merge instead of being concatenated and sorted again.
+    """
+    return list(merge_activities(
+        _normalize(jira_data, from_jira, 'Jira'),
+        _normalize(github_data, from_github, 'GitHub')
+    ))
+
+class ActivityIndex:
+    """Newest-first activities with a sorted position index per source
+
+    Pages are located by bisecting the index, so filtering by source and date range
+    and resuming from a cursor cost O(log n) plus the page size. Cursors encode the
+    sort position of the last activity of a page rather than an offset, so they stay
+    valid when the index is rebuilt with newer activities.
+    """
+    SOURCES = ('jira', 'github')
+
+    def __init__(self, activities: List[Activity]):
+        self.views = {None: self._build(activities)}
+        for source in self.SOURCES:
+            self.views[source] = self._build([activity for activity in activities if activity.source == source])
+
+    @staticmethod
+    def _sort_key(activity: Activity) -> Tuple[float, str, str]:
+        return (-activity.date.timestamp(), activity.source, activity.key)
+
+    @classmethod
+    def _build(cls, activities: List[Activity]) -> Tuple[List[Tuple], List[Activity]]:
+        ordered = sorted(activities, key=cls._sort_key)
+        return [cls._sort_key(activity) for activity in ordered], ordered
+
+    @staticmethod
+    def encode_cursor(sort_key: Tuple[float, str, str]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(sort_key).encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[float, str, str]:
+        """Sort key of a cursor, raising ValueError if it is malformed"""
+        try:
+            timestamp, source, key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return (float(timestamp), str(source), str(key))
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+    def page(self, source: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+             cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Activity], Optional[str], int]:
+        """One page of activities, the cursor of the next page (None on the last one) and the filtered total"""
+        keys, activities = self.views[source]
+        # dates are negated in the keys, so the newest (end) bound comes first
+        low = bisect.bisect_left(keys, (-end.timestamp(),)) if end else 0
+        high = bisect.bisect_right(keys, (-start.timestamp(), chr(0x10FFFF))) if start else len(keys)
+
+        position = low
+        if cursor:
+            position = max(low, bisect.bisect_right(keys, self.decode_cursor(cursor)))
+        stop = min(position + limit, high)
+        next_cursor = self.encode_cursor(keys[stop - 1]) if stop < high else None
+        return activities[position:stop], next_cursor, max(high - low, 0)
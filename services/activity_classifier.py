@@ -0,0 +1,183 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Dict, Optional
+import json
+import os
+import re
+import logging
+from services.activity import Activity
+
+logger = logging.getLogger(__name__)
+
+# report sections, in the order they are shown
+BUCKETS = ('completed', 'in_progress', 'planned')
+BUCKET_TITLES = {'completed': 'Completed Tasks', 'in_progress': 'In Progress', 'planned': 'Planned'}
+
+# status (Jira) or state (GitHub PRs and reviews) -> bucket, lowercased
+DEFAULT_STATUS_BUCKETS = {
+    'jira': {
+        'done': 'completed', 'closed': 'completed', 'resolved': 'completed', 'verified': 'completed',
+        'in progress': 'in_progress', 'code review': 'in_progress', 'review': 'in_progress',
+        'in review': 'in_progress', 'on_qa': 'in_progress', 'testing': 'in_progress',
+        'to do': 'planned', 'open': 'planned', 'new': 'planned', 'backlog': 'planned'
+    },
+    'github': {
+        'merged': 'completed', 'closed': 'completed', 'approved': 'completed',
+        'open': 'in_progress', 'commented': 'in_progress', 'changes_requested': 'in_progress',
+        'dismissed': 'in_progress', 'pending': 'in_progress'
+    },
+    'default': 'in_progress'
+}
+
+JIRA_KEY_PATTERN = re.compile(r'\b([A-Z][A-Z0-9]+-\d+)\b')
+
+def load_status_buckets(path: Optional[str] = None) -> Dict:
+    """Status to bucket mapping, the defaults overridden by the JSON file if it exists"""
+    path = path or os.getenv('STATUS_BUCKETS_PATH', 'status_buckets.json')
+    mapping = {source: dict(statuses) for source, statuses in DEFAULT_STATUS_BUCKETS.items() if source != 'default'}
+    mapping['default'] = DEFAULT_STATUS_BUCKETS['default']
+    if not os.path.exists(path):
+        return mapping
+
+    with open(path, encoding='utf-8') as f:
+        overrides = json.load(f)
+    for source in ('jira', 'github'):
+        for status, bucket in overrides.get(source, {}).items():
+            if bucket not in BUCKETS:
+                raise ValueError(f"Unknown bucket {bucket!r} for {source} status {status!r} in {path}, expected one of {BUCKETS}")
+            mapping[source][status.lower()] = bucket
+    if overrides.get('default') is not None:
+        if overrides['default'] not in BUCKETS:
+            raise ValueError(f"Unknown default bucket {overrides['default']!r} in {path}")
+        mapping['default'] = overrides['default']
+    return mapping
+
+@dataclass(slots=True)
+class WorkItem:
+    """One line of the report: a Jira issue, PR or review with everything done on it"""
+    key: str              # Jira issue key or GitHub URL
+    title: str
+    status: str
+    group: str            # Jira project or GitHub repository
+    source: str
+    kind: str
+    date: datetime        # latest activity
+    notes: List[str] = field(default_factory=list)
+
+    def text(self) -> str:
+        label = self.key if self.source == 'jira' else ('Review' if self.kind == 'review' else 'PR')
+        details = '; '.join(([self.status] if self.status else []) + self.notes)
+        return f"{label}: {self.title}" + (f" ({details})" if details else "")
+
+class ActivityClassifier:
+    """Rule-based classification of activities into report buckets, grouped by project or repository
+
+    - A Jira issue and its status changes, comments and worklogs become one item,
+      bucketed by the issue's latest status.
+    - Commits are folded into their PR, and a PR whose title mentions a Jira issue of
+      the same report is folded into that issue instead of being listed twice.
+    - PRs and reviews are bucketed by their state.
+    """
+    def __init__(self, status_buckets: Optional[Dict] = None):
+        self.status_buckets = status_buckets or load_status_buckets()
+
+    def bucket(self, source: str, status: str) -> str:
+        return self.status_buckets[source].get((status or '').lower(), self.status_buckets['default'])
+
+    @staticmethod
+    def _lines(additions: Optional[int], deletions: Optional[int]) -> Optional[str]:
+        return f"+{additions}/-{deletions}" if additions is not None and deletions is not None else None
+
+    def _jira_items(self, activities: List[Activity]) -> Dict[str, WorkItem]:
+        items: Dict[str, WorkItem] = {}
+        moves: Dict[str, List[str]] = {}
+        comments: Dict[str, int] = {}
+        logged: Dict[str, List[str]] = {}
+        # newest first, so the first activity of an issue carries its latest status
+        for activity in activities:
+            key = activity.issue_key
+            if key not in items:
+                items[key] = WorkItem(key, activity.title, activity.status, activity.group, 'jira', activity.kind, activity.date)
+            if activity.kind == 'Status Change':
+                moves.setdefault(key, []).append(activity.detail)
+            elif activity.kind == 'Comment':
+                comments[key] = comments.get(key, 0) + 1
+            elif activity.kind == 'Work Log':
+                logged.setdefault(key, []).append(activity.detail)
+            else:
+                # the issue itself, its type is more telling than an event kind
+                items[key].kind = activity.kind
+
+        for key, item in items.items():
+            item.notes += [f"moved {move}" for move in reversed(moves.get(key, []))]
+            if comments.get(key):
+                item.notes.append(f"{comments[key]} comment{'s' if comments[key] > 1 else ''}")
+            if logged.get(key):
+                item.notes.append(f"logged {' + '.join(reversed(logged[key]))}")
+        return items
+
+    def classify(self, activities: List[Activity]) -> Dict[str, Dict[str, List[WorkItem]]]:
+        """bucket -> group -> work items, newest first; empty buckets and groups are left out"""
+        jira_items = self._jira_items([activity for activity in activities if activity.source == 'jira'])
+        github_items: Dict[str, WorkItem] = {}
+        commits: Dict[str, List[Activity]] = {}
+        lines: Dict[str, Optional[str]] = {}
+        bucket_of: Dict[int, str] = {id(item): self.bucket('jira', item.status) for item in jira_items.values()}
+
+        for activity in activities:
+            if activity.source != 'github':
+                continue
+            if activity.kind == 'commit':
+                commits.setdefault(activity.parent or activity.key, []).append(activity)
+                continue
+            item = WorkItem(activity.key, activity.title, activity.status, activity.group, 'github', activity.kind, activity.date)
+            lines[activity.key] = self._lines(activity.additions, activity.deletions)
+            if lines[activity.key]:
+                item.notes.append(lines[activity.key])
+            github_items[activity.key] = item
+
+        for parent, parent_commits in commits.items():
+            item = github_items.get(parent)
+            if item is None:
+                # commits of a PR that is not in the report, listed on their own
+                for commit in parent_commits:
+                    github_items[commit.key] = WorkItem(
+                        commit.key, commit.title, '', commit.group, 'github', 'commit', commit.date,
+                        [note for note in [self._lines(commit.additions, commit.deletions)] if note]
+                    )
+                continue
+            item.notes.append(f"{len(parent_commits)} commit{'s' if len(parent_commits) > 1 else ''}")
+            item.date = max(item.date, *(commit.date for commit in parent_commits))
+
+        for key, item in list(github_items.items()):
+            if item.kind == 'commit':
+                bucket_of[id(item)] = 'in_progress'
+                continue
+            bucket_of[id(item)] = self.bucket('github', item.status)
+            if item.kind != 'pull_request':
+                continue
+            # the PR implements a Jira issue of this report: mention it there instead
+            mentioned = [jira_key for jira_key in JIRA_KEY_PATTERN.findall(item.title) if jira_key in jira_items]
+            if mentioned:
+                issue = jira_items[mentioned[0]]
+                issue.notes.append(" ".join(part for part in ("PR", item.status, lines[key]) if part))
+                issue.date = max(issue.date, item.date)
+                del github_items[key]
+
+        classified: Dict[str, Dict[str, List[WorkItem]]] = {}
+        for item in sorted([*jira_items.values(), *github_items.values()], key=lambda item: item.date, reverse=True):
+            group = f"Jira project {item.group}" if item.source == 'jira' else f"GitHub repository {item.group}"
+            classified.setdefault(bucket_of[id(item)], {}).setdefault(group, []).append(item)
+        return {bucket: classified[bucket] for bucket in BUCKETS if bucket in classified}
+
+    @staticmethod
+    def format(classified: Dict[str, Dict[str, List[WorkItem]]]) -> str:
+        """Pre-bucketed, grouped text for the LLM, one line per work item"""
+        sections = []
+        for bucket, groups in classified.items():
+            lines = [f"{BUCKET_TITLES[bucket]}:"]
+            for group, items in groups.items():
+                lines.append(f"  {group}:")
+                lines.extend(f"    - {item.text()}" for item in items)
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections)
@@ -0,0 +1,169 @@
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Callable, Awaitable, Optional
+import asyncio
+import json
+import os
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+def to_utc_iso(value) -> str:
+    """Normalize a datetime or ISO timestamp (Jira or GitHub format) to a sortable UTC string"""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # naive datetimes are local time, like the datetime.now() used for report windows
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class ActivityStore:
+    """Local SQLite copy of fetched activities, refreshed incrementally from each source
+
+    Every source (for example "jira:me@example.com") keeps the range of update times
+    it covers, from covered_from to the synced_at watermark. A refresh only asks the
+    source for items updated since that watermark and merges them into the store, so
+    reports for an already covered window (including past weeks) are built from local
+    data. With a shared state only one worker process syncs a source at a time, the
+    others wait and use what it stored.
+    """
+    def __init__(self, path: Optional[str] = None, shared_state=None):
+        self.path = path or os.getenv('ACTIVITY_DB_PATH', 'data/activities.db')
+        self.shared_state = shared_state
+        # skip the remote fetch entirely when the last sync is more recent than this
+        self.refresh_interval = timedelta(seconds=float(os.getenv('ACTIVITY_REFRESH_INTERVAL', '300')))
+        # refetch a little before the watermark to absorb clock and timezone differences
+        self.sync_overlap = timedelta(minutes=float(os.getenv('ACTIVITY_SYNC_OVERLAP', '1440')))
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # every worker process reads and writes this database, WAL keeps readers from blocking the writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS activities (
+                    source TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    updated TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (source, item_id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_activities_updated ON activities (source, updated)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    source TEXT PRIMARY KEY,
+                    synced_at TEXT NOT NULL,
+                    covered_from TEXT NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_sync_state(self, source: str) -> Optional[Dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT synced_at, covered_from FROM sync_state WHERE source = ?", (source,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'synced_at': datetime.fromisoformat(row[0]),
+            'covered_from': datetime.fromisoformat(row[1])
+        }
+
+    def merge(self, source: str, items: List[Dict], id_key: str, updated_key: str, date_key: str,
+              synced_at: Optional[datetime], covered_from: Optional[datetime]):
+        """Upsert fetched items and move the source watermark forward, or leave it alone when None"""
+        rows = [
+            (source, item[id_key], to_utc_iso(item[updated_key]), to_utc_iso(item[date_key]), json.dumps(item))
+            for item in items
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("""
+                INSERT INTO activities (source, item_id, updated, date, payload) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (source, item_id) DO UPDATE SET
+                    updated = excluded.updated, date = excluded.date, payload = excluded.payload
+            """, rows)
+            if synced_at is None:
+                return
+            conn.execute("""
+                INSERT INTO sync_state (source, synced_at, covered_from) VALUES (?, ?, ?)
+                ON CONFLICT (source) DO UPDATE SET
+                    synced_at = excluded.synced_at, covered_from = excluded.covered_from
+            """, (source, synced_at.isoformat(), covered_from.isoformat()))
+
+    def covers(self, source: str, start_date: datetime, end_date: datetime) -> bool:
+        """Whether the stored items of a source are complete for the date range"""
+        state = self.get_sync_state(source)
+        return state is not None and state['covered_from'] <= start_date and min(end_date, datetime.now()) <= state['synced_at']
+
+    def get_activities(self, source: str, start_date: datetime, end_date: datetime) -> List[Dict]:
+        """Stored items updated in the date range, newest first"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("""
+                SELECT payload FROM activities
+                WHERE source = ? AND updated >= ? AND updated <= ?
+                ORDER BY date DESC
+            """, (source, to_utc_iso(start_date), to_utc_iso(end_date))).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    async def sync(self, source: str, fetch: Callable[[datetime, datetime], Awaitable[List[Dict]]],
+                   start_date: datetime, end_date: datetime,
+                   id_key: str, updated_key: str, date_key: str) -> int:
+        """Fetch what changed since the last sync and merge it into the store
+
+        Returns the number of fetched items, or -1 when the store was fresh enough
+        that no remote request was made. Exceptions from fetch leave the watermark
+        untouched so the next refresh retries the same range.
+        """
+        state = await asyncio.to_thread(self.get_sync_state, source)
+        plan = self._plan_sync(source, state, start_date, end_date)
+        if plan is None or self.shared_state is None:
+            return await self._fetch(source, fetch, plan, end_date, id_key, updated_key, date_key)
+
+        async with self.shared_state.lease(f"sync:{source}") as waited:
+            current = await asyncio.to_thread(self.get_sync_state, source)
+            # another worker moved the watermark forward while this one waited, its result covers
+            # this window too; a sync that only extended the range backward does not
+            if (waited and current is not None and current['covered_from'] <= start_date <= current['synced_at']
+                    and (state is None or current['synced_at'] > state['synced_at'])):
+                logger.debug(f"{source} synced by another worker at {current['synced_at']}, serving stored activities")
+                return -1
+            plan = self._plan_sync(source, current, start_date, end_date)
+            return await self._fetch(source, fetch, plan, end_date, id_key, updated_key, date_key)
+
+    def _plan_sync(self, source: str, state: Optional[Dict], start_date: datetime, end_date: datetime) -> Optional[tuple]:
+        """Fetch start and the new covered range of a sync, None when the stored items are fresh enough"""
+        now = datetime.now()
+        # a window ending in the past only needs the store to cover it up to its end
+        window_end = min(end_date, now)
+
+        if state is None:
+            return start_date, start_date, window_end
+        if window_end < state['covered_from']:
+            # an old window before the covered range, store it without claiming the gap as covered
+            return start_date, None, None
+        if start_date < state['covered_from']:
+            # this window starts before the covered range, fetch all of it and extend the range
+            return start_date, start_date, max(state['synced_at'], window_end)
+        if window_end <= state['synced_at'] or now - state['synced_at'] < self.refresh_interval:
+            logger.debug(f"{source} synced at {state['synced_at']}, serving stored activities")
+            return None
+        if start_date > state['synced_at']:
+            # the covered range ends before this window starts, restart it here rather than claim the gap
+            return start_date, start_date, window_end
+        return max(start_date, state['synced_at'] - self.sync_overlap), state['covered_from'], window_end
+
+    async def _fetch(self, source: str, fetch: Callable[[datetime, datetime], Awaitable[List[Dict]]],
+                     plan: Optional[tuple], end_date: datetime, id_key: str, updated_key: str, date_key: str) -> int:
+        if plan is None:
+            return -1
+        fetch_start, covered_from, synced_at = plan
+        items = await fetch(fetch_start, end_date)
+        # encoding and writing a large fetch would hold up every other request
+        await asyncio.to_thread(self.merge, source, items, id_key, updated_key, date_key, synced_at, covered_from)
+        logger.info(f"Synced {len(items)} {source} items updated since {fetch_start}")
+        return len(items)
@@ -0,0 +1,121 @@
+from typing import Dict, List, AsyncIterator, Optional
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AIReportJob:
+    """AI report generated in the background, readable in full or as a token stream"""
+    def __init__(self, report_id: str):
+        self.report_id = report_id
+        self.chunks: List[str] = []
+        # queued -> running -> done
+        self.state = 'queued'
+        self.done = False
+        self.error: Optional[str] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks).strip()
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def run(self, chunks: AsyncIterator[str]):
+        """Consume the model output and publish every chunk to the readers"""
+        self.state = 'running'
+        try:
+            async for chunk in chunks:
+                self.chunks.append(chunk)
+                await self._notify()
+            logger.info(f"AI report {self.report_id}: {self.text}")
+        except Exception as e:
+            logger.error(f"Error generating AI report {self.report_id}: {str(e)}")
+            self.error = str(e)
+        finally:
+            self.state = 'done'
+            self.done = True
+            await self._notify()
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Yield every chunk from the beginning, waiting for new ones until the job finishes"""
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or position < len(self.chunks))
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done and position >= len(self.chunks):
+                return
+
+    def to_record(self) -> Dict:
+        return {'state': self.state, 'done': self.done, 'error': self.error, 'text': "".join(self.chunks)}
+
+    async def share(self, shared_state, retention: float, report_key: Optional[str] = None) -> asyncio.Task:
+        """Publish the job to the other workers until it is done, then keep it for retention seconds
+
+        Unfinished records (and the claim on report_key) expire when this process stops
+        renewing them, so a job of a dead worker is not waited for forever.
+        """
+        # written at once, another worker may already be joining the claimed key
+        await asyncio.to_thread(shared_state.put, 'ai_report', self.report_id, self.to_record(), shared_state.lease_ttl)
+
+        async def publish():
+            published, renewed = ('queued', 0, False), time.monotonic()
+            while True:
+                progress = (self.state, len(self.chunks), self.done)
+                if progress != published or time.monotonic() - renewed > shared_state.lease_ttl / 3:
+                    ttl = retention if self.done else shared_state.lease_ttl
+                    await asyncio.to_thread(shared_state.put, 'ai_report', self.report_id, self.to_record(), ttl)
+                    if report_key is not None and not self.done:
+                        await asyncio.to_thread(
+                            shared_state.put, 'ai_report_key', report_key, {'report_id': self.report_id}, shared_state.lease_ttl
+                        )
+                    published, renewed = progress, time.monotonic()
+                if self.done:
+                    break
+                await asyncio.sleep(shared_state.poll_interval)
+            if report_key is not None:
+                await asyncio.to_thread(shared_state.delete, 'ai_report_key', report_key)
+
+        return asyncio.create_task(publish())
+
+class SharedAIReportJob:
+    """An AI report generated by another worker, followed through the shared state"""
+    def __init__(self, report_id: str, shared_state, record: Dict):
+        self.report_id = report_id
+        self.shared_state = shared_state
+        self.chunks_text = ''
+        self._apply(record)
+
+    @property
+    def text(self) -> str:
+        return self.chunks_text.strip()
+
+    def _apply(self, record: Optional[Dict]):
+        if record is None:
+            # the record of an unfinished job expires when its worker stops renewing it
+            record = {'state': 'done', 'done': True, 'error': "The worker generating this AI report stopped", 'text': self.chunks_text}
+        self.state = record['state']
+        self.done = record['done']
+        self.error = record['error']
+        self.chunks_text = record['text']
+
+    async def refresh(self):
+        self._apply(await asyncio.to_thread(self.shared_state.get, 'ai_report', self.report_id))
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Yield the text as the other worker publishes it, until the job finishes"""
+        position = 0
+        while True:
+            if position < len(self.chunks_text):
+                yield self.chunks_text[position:]
+                position = len(self.chunks_text)
+            if self.done:
+                return
+            await asyncio.sleep(self.shared_state.poll_interval)
+            await self.refresh()
@@ -1,11 +1,116 @@
 from langchain_community.llms import Ollama
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from typing import List, Dict
+from langchain_core.callbacks import BaseCallbackHandler
+from typing import Any, List, Dict, AsyncIterator, Optional, Tuple
+from datetime import datetime, timezone
+import asyncio
 import json
 import os
+import time
+import logging
 from dotenv import load_dotenv
-import re
+from services.llm_cache import LLMCache
+from services.activity import Activity
+from services.activity_classifier import ActivityClassifier, BUCKET_TITLES, WorkItem
+from services.metrics import LLM_LOAD_DURATION, LLM_TOKENS, LLM_TOKENS_PER_SECOND
+
+logger = logging.getLogger(__name__)
+
+
+class ThinkTagFilter:
+    """Incrementally remove <think>...</think> sections from streamed model output"""
+    OPEN_TAG = '<think>'
+    CLOSE_TAG = '</think>'
+    
+    def __init__(self):
+        self.buffer = ''
+        self.inside = False
+        self.started = False
+    
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str) -> int:
+        """Length of the longest suffix of text that could be the start of tag"""
+        for length in range(min(len(text), len(tag) - 1), 0, -1):
+            if tag.startswith(text[-length:]):
+                return length
+        return 0
+    
+    def _emit(self, text: str) -> str:
+        # drop the whitespace left behind by a leading <think> block
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+        return text
+    
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk of model output and return the text that is safe to show"""
+        self.buffer += chunk
+        output = []
+        while True:
+            if self.inside:
+                index = self.buffer.find(self.CLOSE_TAG)
+                if index < 0:
+                    keep = self._partial_tag_length(self.buffer, self.CLOSE_TAG)
+                    self.buffer = self.buffer[len(self.buffer) - keep:]
+                    break
+                self.buffer = self.buffer[index + len(self.CLOSE_TAG):]
+                self.inside = False
+            else:
+                index = self.buffer.find(self.OPEN_TAG)
+                if index < 0:
+                    keep = self._partial_tag_length(self.buffer, self.OPEN_TAG)
+                    output.append(self.buffer[:len(self.buffer) - keep])
+                    self.buffer = self.buffer[len(self.buffer) - keep:]
+                    break
+                output.append(self.buffer[:index])
+                self.buffer = self.buffer[index + len(self.OPEN_TAG):]
+                self.inside = True
+        return self._emit(''.join(output))
+    
+    def flush(self) -> str:
+        """Return any buffered text once the stream has ended"""
+        text = '' if self.inside else self.buffer
+        self.buffer = ''
+        return self._emit(text)
+
+
+class TokenMetricsHandler(BaseCallbackHandler):
+    """Record prompt and completion token counts and generation speed of every LLM call
+    
+    Ollama reports exact counts and the generation time in the final response; when
+    they are missing the text is estimated and the wall time is used instead. Prompt
+    tokens reused from Ollama's cache are not counted by Ollama.
+    """
+    def __init__(self, model: str):
+        self.model = model
+        self.started: Dict[Any, float] = {}
+        self.prompt_tokens: Dict[Any, int] = {}
+    
+    def on_llm_start(self, serialized: Dict, prompts: List[str], *, run_id, **kwargs):
+        self.started[run_id] = time.perf_counter()
+        self.prompt_tokens[run_id] = sum(AIReportService._estimate_tokens(prompt) for prompt in prompts)
+    
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        elapsed = time.perf_counter() - self.started.pop(run_id, time.perf_counter())
+        estimated_prompt_tokens = self.prompt_tokens.pop(run_id, 0)
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                prompt_tokens = info.get('prompt_eval_count', estimated_prompt_tokens)
+                completion_tokens = info.get('eval_count') or AIReportService._estimate_tokens(generation.text)
+                # eval_duration is in nanoseconds and excludes model loading and prompt evaluation
+                duration = info['eval_duration'] / 1e9 if info.get('eval_duration') else elapsed
+                # a cold model is loaded first, load_duration is zero when it was already in memory
+                if info.get('load_duration'):
+                    LLM_LOAD_DURATION.observe(info['load_duration'] / 1e9, model=self.model)
+                LLM_TOKENS.inc(prompt_tokens, model=self.model, kind='prompt')
+                LLM_TOKENS.inc(completion_tokens, model=self.model, kind='completion')
+                if duration > 0:
+                    LLM_TOKENS_PER_SECOND.observe(completion_tokens / duration, model=self.model)
+    
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs):
+        self.started.pop(run_id, None)
+        self.prompt_tokens.pop(run_id, None)
 
 
 class AIReportService:
@@ -14,14 +119,22 @@ class AIReportService:
         ollama_api_url = os.getenv('OLLAMA_API_URL', 'http://localhost:11434')
         ollama_model = os.getenv('OLLAMA_MODEL', 'deepseek-r1:7b')
         
+        # keep the model loaded between reports, Ollama unloads it after 5 minutes by default
+        keep_alive = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
         self.llm = Ollama(
             model=ollama_model,
-            base_url=ollama_api_url
+            base_url=ollama_api_url,
+            keep_alive=int(keep_alive) if keep_alive.lstrip('-').isdigit() else keep_alive,
+            num_ctx=int(os.environ['OLLAMA_NUM_CTX']) if os.getenv('OLLAMA_NUM_CTX') else None,
+            num_predict=int(os.environ['OLLAMA_NUM_PREDICT']) if os.getenv('OLLAMA_NUM_PREDICT') else None
         )
-        self.prompt_template = PromptTemplate(
-            input_variables=["activities"],
-            template="""
-            Please generate a concise weekly report based on the following activity data, including Jira tasks and GitHub activities.
+        
+        # the static instructions go in the system prompt, a prefix shared by every report that Ollama
+        # can reuse from its cache; the prompt only carries the work items, bucketed and deduplicated
+        # by ActivityClassifier, so the model only phrases them
+        self.system_prompt = """
+            Please write a concise weekly report from the work items you are given, taken from Jira and GitHub.
+            The items are already sorted into sections and grouped by project or repository.
             Please organize the content in English following this format (do not include other content):
             
             This Week's Work:
@@ -34,69 +147,217 @@ class AIReportService:
               1. xxxxx
               2. xxxxx
               ...
+            
+            - Planned
+              1. xxxxx
+              ...
 
             Notes:
-            1. Keep it concise
-            2. Use clear and simple language
-            3. Highlight important work items
-            4. Avoid technical details
+            1. Keep every item in the section it is listed under, do not move, add or drop items
+            2. Leave out a section that has no items
+            3. Turn each item into one short sentence in clear and simple language
+            4. Avoid technical details like URLs, line counts and issue keys
+            """
+        self.prompt_template = PromptTemplate(
+            input_variables=["activities"],
+            template="""Work Items:
+{activities}
+"""
+        )
+        self.chain = self.prompt_template | self.llm.bind(system=self.system_prompt)
+        
+        # used to shorten one chunk of a long item list before the final report
+        self.map_system_prompt = """
+            Please summarize the work items you are given, all from one section of a weekly report
+            and listed under their project or repository. Reply in English with only a numbered list:
+            
+            1. project: xxxxx
             
-            Activity Data:
-            {activities}
+            Merge closely related items of the same project into a single item and keep each item short.
             """
+        self.map_prompt_template = PromptTemplate(
+            input_variables=["section", "activities"],
+            template="""Section "{section}":
+{activities}
+"""
         )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
+        self.map_chain = self.map_prompt_template | self.llm.bind(system=self.map_system_prompt)
+        
+        # token budget for the activity data of one prompt, longer lists are summarized in chunks
+        self.prompt_token_budget = int(os.getenv('OLLAMA_PROMPT_TOKEN_BUDGET', '3000'))
+        self.map_concurrency = int(os.getenv('OLLAMA_MAP_CONCURRENCY', '2'))
+        
+        self.model = ollama_model
+        self.classifier = ActivityClassifier()
+        self.cache = LLMCache()
+        self.token_metrics = TokenMetricsHandler(ollama_model)
+        # last warm-up that finished, None before the first one
+        self.warmed_up_at = None
         
     
-    def _format_activities(self, activities: List[Dict]) -> str:
+    def _format_activities(self, activities: List[Activity]) -> str:
         """Format activity data into text suitable for LLM processing"""
-        formatted = []
-        for activity in activities:
-            formatted.append(f"- {activity['content']} ({activity['date']})")
-        return "\n".join(formatted)
+        return self.classifier.format(self.classifier.classify(activities))
     
-    def generate_ai_report(self, jira_data: List[Dict], github_data: List[Dict]) -> Dict:
-        """Generate AI-enhanced weekly report"""
-        # Merge and format activity data
-        all_activities = []
-        
-        # Process Jira data
-        for activity in jira_data:
-            all_activities.append({
-                'type': 'jira',
-                'date': activity['updated'],
-                'content': f"Jira Task: {activity['key']} - {activity['summary']} ({activity['status']})"
-            })
-        
-        # Process GitHub data
-        for activity in github_data:
-            all_activities.append({
-                'type': 'github',
-                'date': activity['date'],
-                'content': f"GitHub Activity: {activity['repo']} - {activity['message'] if activity['type'] == 'commit' else activity['title']}"
-            })
-        
-        # Sort by date
-        all_activities.sort(key=lambda x: x['date'], reverse=True)
-        
-        # Format activity data
-        formatted_activities = self._format_activities(all_activities)
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count, about four characters per token"""
+        return len(text) // 4 + 1
+    
+    def _chunk_lines(self, grouped_lines: Dict[Tuple[str, Optional[str]], List[str]]) -> List[Dict]:
+        """Pack the groups of each section into as few chunks as the token budget allows
         
-        # Generate report using LLM
-        ai_report = self.chain.run(activities=formatted_activities)
-        self.chain.invoke({"activities": formatted_activities})
+        Consecutive groups share a chunk, a group moves to the next chunk whole when it
+        does not fit the rest of the current one, and only a group larger than the whole
+        budget is split. The number of map calls so follows the size of the input, not
+        the number of groups. A group of None adds its lines without a heading.
+        """
+        chunks = []
+        chunk_section, chunk_lines, chunk_tokens = None, [], 0
+        
+        def flush():
+            if chunk_lines:
+                chunks.append({'section': chunk_section, 'activities': "\n".join(chunk_lines)})
+        
+        for (section, group), lines in grouped_lines.items():
+            heading = [f"{group}:"] if group is not None else []
+            group_tokens = sum(map(self._estimate_tokens, heading + lines))
+            if section != chunk_section or chunk_tokens + group_tokens > self.prompt_token_budget:
+                flush()
+                chunk_section, chunk_lines, chunk_tokens = section, [], 0
+            for line in heading + lines:
+                tokens = self._estimate_tokens(line)
+                if chunk_lines and chunk_tokens + tokens > self.prompt_token_budget:
+                    # a group over the whole budget, continue it under its heading in the next chunk
+                    flush()
+                    chunk_lines, chunk_tokens = list(heading), sum(map(self._estimate_tokens, heading))
+                chunk_lines.append(line)
+                chunk_tokens += tokens
+        flush()
+        return chunks
+    
+    async def _summarize_chunks(self, chunks: List[Dict]) -> List[str]:
+        """Map step: summarize every chunk, several at a time"""
+        summaries = await self.map_chain.abatch(chunks, config={
+            "max_concurrency": self.map_concurrency,
+            "callbacks": [self.token_metrics]
+        })
+        results = []
+        for summary in summaries:
+            think_filter = ThinkTagFilter()
+            results.append((think_filter.feed(summary) + think_filter.flush()).strip())
+        return results
+    
+    async def _reduce_activities(self, classified: Dict[str, Dict[str, List[WorkItem]]]) -> str:
+        """Shrink a work item list that does not fit the token budget into per-group summaries
         
-        # Process <think> tags
-        ai_report = re.sub(r'<think>.*?</think>', '', ai_report, flags=re.DOTALL)
+        Items stay in their section and are summarized in parallel chunks of whole Jira
+        projects or GitHub repositories. If the summaries together still exceed the
+        budget they are summarized again within their section, so the final prompt
+        always fits the model context.
+        """
+        grouped_lines = {
+            (BUCKET_TITLES[bucket], group): [f"- {item.text()}" for item in items]
+            for bucket, groups in classified.items() for group, items in groups.items()
+        }
+        
+        level = 0
+        while True:
+            chunks = self._chunk_lines(grouped_lines)
+            level += 1
+            logger.info(f"Summarizing {sum(map(len, grouped_lines.values()))} lines in {len(chunks)} chunks (pass {level})")
+            summaries = await self._summarize_chunks(chunks)
+            by_section: Dict[str, List[str]] = {}
+            for chunk, summary in zip(chunks, summaries):
+                by_section.setdefault(chunk['section'], []).extend(line for line in summary.splitlines() if line.strip())
+            formatted = "\n\n".join(f"{section}:\n" + "\n".join(lines) for section, lines in by_section.items())
+            # the summary items name their project, the next pass packs them without headings
+            grouped_lines = {(section, None): lines for section, lines in by_section.items()}
+            # stop when it fits, or when another pass would not merge any chunks
+            if self._estimate_tokens(formatted) <= self.prompt_token_budget or len(self._chunk_lines(grouped_lines)) >= len(chunks):
+                return formatted
+    
+    def _cache_key(self, formatted_activities: str) -> str:
+        """Cache key covering everything that determines the generated report"""
+        return LLMCache.make_key(
+            self.model,
+            self.system_prompt,
+            self.prompt_template.template,
+            self.map_system_prompt,
+            self.map_prompt_template.template,
+            str(self.prompt_token_budget),
+            str(self.llm.num_predict),
+            formatted_activities
+        )
+    
+    def report_key(self, activities: List[Activity]) -> str:
+        """Key identifying the AI report of an activity set, equal keys produce the same report"""
+        return self._cache_key(self._format_activities(activities))
+    
+    async def is_cached(self, activities: List[Activity]) -> bool:
+        """Whether the AI report of an activity set is cached, checked off the event loop"""
+        return await asyncio.to_thread(lambda: self.cache.contains(self.report_key(activities)))
+    
+    async def warm_up(self) -> float:
+        """Load the model and evaluate the report instructions, so the next report skips both
+        
+        Generates a single token, returns the seconds it took.
+        """
+        started = time.perf_counter()
+        await self.llm.ainvoke(
+            self.prompt_template.format(activities="(none)"), system=self.system_prompt, num_predict=1
+        )
+        elapsed = time.perf_counter() - started
+        self.warmed_up_at = datetime.now(timezone.utc)
+        logger.info(f"Ollama model {self.model} warmed up in {elapsed:.1f}s")
+        return elapsed
+    
+    async def stream_ai_report(self, activities: List[Activity]) -> AsyncIterator[str]:
+        """Stream the AI report as the model produces it, with <think> sections removed
+        
+        Reports for an unchanged activity set are served from the cache at once.
+        """
+        # classifying a long list and the cache's SQLite writes would hold up every other request
+        def classify():
+            classified = self.classifier.classify(activities)
+            return classified, self.classifier.format(classified)
+        classified, formatted_activities = await asyncio.to_thread(classify)
+        
+        cache_key = self._cache_key(formatted_activities)
+        cached_report = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached_report is not None:
+            logger.info("Serving AI report from cache")
+            yield cached_report
+            return
+        
+        if self._estimate_tokens(formatted_activities) > self.prompt_token_budget:
+            # too long for one prompt, summarize chunks first and stream the final pass
+            formatted_activities = await self._reduce_activities(classified)
+        think_filter = ThinkTagFilter()
+        output = []
+        
+        async for chunk in self.chain.astream(
+            {"activities": formatted_activities}, config={"callbacks": [self.token_metrics]}
+        ):
+            text = think_filter.feed(chunk)
+            if text:
+                output.append(text)
+                yield text
+        
+        text = think_filter.flush()
+        if text:
+            output.append(text)
+            yield text
+        
+        await asyncio.to_thread(self.cache.set, cache_key, "".join(output))
+    
+    async def generate_ai_report(self, activities: List[Activity]) -> Dict:
+        """Generate AI-enhanced weekly report"""
+        # Generate report using LLM
+        ai_report = "".join([chunk async for chunk in self.stream_ai_report(activities)])
         ai_report = ai_report.strip()
         
         return {
-            'generated_at': '2024-04-16T00:00:00Z',  # Should use current time in actual usage
-            'summary': {
-                'total_jira_tasks': len(jira_data),
-                'total_github_activities': len(github_data),
-                'total_activities': len(all_activities)
-            },
-            'activities': all_activities,
+            'generated_at': datetime.now(timezone.utc).isoformat(),
             'ai_report': ai_report
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,103 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into one execution shared by every caller"""
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            logger.debug(f"Joining in-flight call {key}")
+        # a caller that goes away must not cancel the call for the others
+        return await asyncio.shield(task)
+
+class LLMJobQueue:
+    """Bounded priority queue in front of the LLM with a fixed number of workers
+
+    Lower priority values run first; jobs with the same priority run in order of
+    submission. Interactive reports therefore overtake team and background jobs
+    that are still waiting, and no more than `concurrency` generations hit the
+    model at the same time.
+    """
+    INTERACTIVE = 0
+    TEAM = 1
+    BACKGROUND = 2
+
+    def __init__(self, concurrency: int, max_size: int):
+        self.concurrency = concurrency
+        self.queue = asyncio.PriorityQueue(maxsize=max_size)
+        self.counter = itertools.count()
+        self.workers = []
+        self.running = 0
+        # submitters waiting for room in a full queue
+        self.waiting = 0
+
+    def start(self):
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def _item(self, priority: int, fn: Callable[[], Awaitable[Any]]) -> tuple:
+        future = asyncio.get_running_loop().create_future()
+        return (priority, next(self.counter), fn, future), future
+
+    def submit_nowait(self, priority: int, fn: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Queue a job and return a future for its result, raising asyncio.QueueFull when the queue is full"""
+        item, future = self._item(priority, fn)
+        self.queue.put_nowait(item)
+        return future
+
+    async def submit(self, priority: int, fn: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Queue a job, waiting for room in the queue, and return a future for its result"""
+        item, future = self._item(priority, fn)
+        self.waiting += 1
+        try:
+            await self.queue.put(item)
+        finally:
+            self.waiting -= 1
+        return future
+
+    async def run(self, priority: int, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await (await self.submit(priority, fn))
+
+    def stats(self) -> Dict:
+        return {
+            'queued': self.queue.qsize(),
+            'waiting': self.waiting,
+            'running': self.running,
+            'max_size': self.queue.maxsize,
+            'concurrency': self.concurrency
+        }
+
+    async def _worker(self):
+        while True:
+            _, _, fn, future = await self.queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                self.running += 1
+                try:
+                    result = await fn()
+                    if not future.done():
+                        future.set_result(result)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                finally:
+                    self.running -= 1
+            finally:
+                self.queue.task_done()
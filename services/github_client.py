@@ -0,0 +1,159 @@
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Tuple, Optional
+import asyncio
+import json
+import os
+import time
+import aiohttp
+import logging
+from services.metrics import UPSTREAM_REQUESTS, UPSTREAM_BYTES
+
+logger = logging.getLogger(__name__)
+
+class GitHubRateLimitError(Exception):
+    """Raised when GitHub keeps throttling a request beyond the configured waits and retries"""
+
+class GitHubGraphQLError(Exception):
+    """Raised when a GraphQL response reports errors"""
+
+class GitHubClient:
+    """Pooled GitHub API client with rate-limit-aware scheduling
+
+    - X-RateLimit-* headers are tracked per resource (core, search, graphql); when
+      the remaining quota runs low, requests are queued and spaced out until reset.
+    - Secondary rate limits, 429 and 5xx responses are retried with backoff.
+    """
+    API_URL = "https://api.github.com"
+
+    def __init__(self, headers: Dict[str, str]):
+        self.headers = headers
+        # GitHub Enterprise serves the API under https://<host>/api/v3
+        self.api_url = os.getenv('GITHUB_API_URL', self.API_URL).rstrip('/')
+        # and GraphQL under https://<host>/api/graphql, next to it rather than below it
+        self.graphql_url = self.api_url[:-len('/v3')] + '/graphql' if self.api_url.endswith('/api/v3') else self.api_url + '/graphql'
+        self.timeout = aiohttp.ClientTimeout(total=float(os.getenv('GITHUB_REQUEST_TIMEOUT', '20')))
+        self.pool_size = int(os.getenv('GITHUB_POOL_SIZE', '10'))
+        self.max_retries = int(os.getenv('GITHUB_MAX_RETRIES', '3'))
+        # longest wait for a rate limit reset before giving up on a request
+        self.max_rate_limit_wait = float(os.getenv('GITHUB_MAX_RATE_LIMIT_WAIT', '60'))
+        # start spacing requests out when this few remain in the current window
+        self.rate_limit_reserve = int(os.getenv('GITHUB_RATE_LIMIT_RESERVE', '5'))
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        # resource -> (remaining, reset epoch seconds)
+        self.rate_limits: Dict[str, Tuple[int, float]] = {}
+        self.rate_limit_locks: Dict[str, asyncio.Lock] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Keep-alive connection pool shared by all requests of this client"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(headers=self.headers, timeout=self.timeout, connector=connector)
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    @staticmethod
+    def _resource(path: str) -> str:
+        if path.startswith('/search/'):
+            return 'search'
+        if path.startswith('/graphql'):
+            return 'graphql'
+        return 'core'
+
+    def _record_rate_limit(self, resource: str, response: aiohttp.ClientResponse):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining is not None and reset is not None:
+            resource = response.headers.get('X-RateLimit-Resource', resource)
+            self.rate_limits[resource] = (int(remaining), float(reset))
+
+    async def _wait_for_quota(self, resource: str):
+        """Queue requests for a resource and space them out when the quota runs low"""
+        lock = self.rate_limit_locks.setdefault(resource, asyncio.Lock())
+        async with lock:
+            if resource not in self.rate_limits:
+                return
+            remaining, reset = self.rate_limits[resource]
+            until_reset = reset - time.time()
+            if until_reset <= 0 or remaining > self.rate_limit_reserve:
+                return
+
+            # spread what is left evenly over the rest of the window
+            delay = until_reset if remaining <= 0 else until_reset / (remaining + 1)
+            if delay > self.max_rate_limit_wait:
+                raise GitHubRateLimitError(f"GitHub {resource} rate limit exhausted, resets in {int(until_reset)}s")
+            logger.warning(f"GitHub {resource} quota low ({remaining} left), delaying request by {delay:.1f}s")
+            await asyncio.sleep(delay)
+            self.rate_limits[resource] = (max(remaining - 1, 0), reset)
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Seconds of a Retry-After header, given either as seconds or as an HTTP date; None if absent or invalid"""
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid Retry-After header {value!r}")
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(retry_at.timestamp() - time.time(), 0)
+
+    def _retry_delay(self, response: aiohttp.ClientResponse, body: bytes, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a throttled or failed response, None if it should not be retried"""
+        if response.status >= 500:
+            return 2 ** attempt
+        if response.status not in (403, 429):
+            return None
+
+        retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None:
+            return retry_after
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            return max(float(response.headers.get('X-RateLimit-Reset', time.time())) - time.time(), 1)
+        if response.status == 429 or b'secondary rate limit' in body.lower():
+            return 2 ** attempt * 5
+        return None
+
+    async def request(self, method: str, path: str, params: Optional[Dict] = None,
+                      json_body: Optional[Dict] = None) -> Tuple[Dict, int]:
+        """Send an API request, returning the decoded JSON and the bytes transferred"""
+        resource = self._resource(path)
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_quota(resource)
+            async with self._get_session().request(
+                method, self.graphql_url if path == '/graphql' else self.api_url + path, params=params, json=json_body
+            ) as response:
+                self._record_rate_limit(resource, response)
+                body = await response.read()
+                UPSTREAM_REQUESTS.inc(service='github', resource=resource, status=response.status)
+                UPSTREAM_BYTES.inc(len(body), service='github', resource=resource)
+
+                if response.status < 400:
+                    return json.loads(body), len(body)
+
+                delay = self._retry_delay(response, body, attempt)
+                if delay is None:
+                    response.raise_for_status()
+                if attempt == self.max_retries or delay > self.max_rate_limit_wait:
+                    raise GitHubRateLimitError(f"GitHub request {path} throttled with status {response.status}")
+
+            logger.warning(f"GitHub request {path} returned {response.status}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def graphql(self, query: str, variables: Dict) -> Tuple[Dict, int]:
+        """Run a GraphQL query, returning its data and the bytes transferred"""
+        response, size = await self.request('POST', '/graphql', json_body={'query': query, 'variables': variables})
+        if response.get('errors'):
+            raise GitHubGraphQLError("; ".join(error.get('message', str(error)) for error in response['errors']))
+        return response['data'], size
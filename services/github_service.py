@@ -1,84 +1,265 @@
-from github import Github
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
 import asyncio
-import json
-import requests
 import logging
+from services.activity import parse_timestamp
+from services.github_client import GitHubClient
 
 logger = logging.getLogger(__name__)
 
+# fields of an authored PR, with the commits pushed to it
+AUTHORED_FIELDS = """
+        ... on PullRequest {
+          title url state merged mergedAt createdAt updatedAt additions deletions reviewDecision
+          author { login }
+          repository { name }
+          commits(last: COMMITS) {
+            nodes { commit { oid url message committedDate additions deletions author { user { login } } } }
+          }
+        }"""
+
+# fields of a reviewed PR, with the reviews LOGIN submitted on it
+REVIEWED_FIELDS = """
+        ... on PullRequest {
+          title url state merged createdAt updatedAt additions deletions
+          author { login }
+          repository { name }
+          reviews(author: LOGIN, last: REVIEWS) { nodes { state submittedAt } }
+        }"""
+
 class GitHubService:
+    """Authored PRs, reviews and commits of a user, fetched with batched GraphQL searches
+
+    Each GraphQL request runs several aliased searches at once (authored and reviewed
+    PRs, or the searches of a whole team) and returns every PR with its merge state,
+    lines changed, reviews and commits, so nothing is fetched per PR. The searches
+    are paged together until all of them are exhausted.
+    """
+    # GraphQL searches, like REST ones, return at most 1000 results per query
+    SEARCH_MAX_RESULTS = 1000
+    # author: qualifiers combined in one query, search queries are limited to 256 characters
+    TEAM_AUTHOR_BATCH = 5
+    # aliased searches sent in one GraphQL request, keeps each request's cost and response size bounded
+    SEARCHES_PER_QUERY = 6
+    # commits and reviews read per PR
+    PR_COMMITS = 100
+    PR_REVIEWS = 20
+
     def __init__(self):
         self.token = os.getenv('GITHUB_TOKEN')
         self.username = os.getenv('GITHUB_USERNAME')
         if not self.token or not self.username:
             raise ValueError("GitHub token or username not set")
-            
+        # PRs per search page, GitHub allows at most 100 but large pages with commits can time out
+        self.page_size = min(int(os.getenv('GITHUB_GRAPHQL_PAGE_SIZE', '50')), 100)
+
         self.headers = {
             "Authorization": f"token {self.token}",
             "Accept": "application/vnd.github.v3+json"
         }
-    
-    async def get_weekly_activities(self, start_date: datetime, end_date: datetime) -> List[Dict]:
-        try:
-            activities = []
-            
-            # get PR data
-            pr_url = f"https://api.github.com/search/issues"
-            pr_params = {
-                "q": f"type:pr author:{self.username} updated:{start_date.strftime('%Y-%m-%d')}..{end_date.strftime('%Y-%m-%d')}",
-                "sort": "updated",
-                "order": "desc"
-            }
-            
-            pr_response = requests.get(pr_url, headers=self.headers, params=pr_params)
-            pr_response.raise_for_status()
-            pr_data = pr_response.json()
-            
-            for pr in pr_data.get('items', []):
-                activities.append({
-                    'type': 'pull_request',
-                    'title': pr['title'],
-                    'url': pr['html_url'],
-                    'date': pr['created_at'],
-                    'state': pr['state'],
-                    'repo': pr['repository_url'].split('/')[-1]
-                })
-            
-            # get review data
-            review_params = {
-                "q": f"type:pr reviewed-by:{self.username} updated:{start_date.strftime('%Y-%m-%d')}..{end_date.strftime('%Y-%m-%d')}",
-                "sort": "updated",
-                "order": "desc"
-            }
-            
-            review_response = requests.get(pr_url, headers=self.headers, params=review_params)
-            review_response.raise_for_status()
-            review_data = review_response.json()
-            
-            # get the existing PR URL set
-            existing_pr_urls = {activity['url'] for activity in activities if activity['type'] == 'pull_request'}
-            
-            for review in review_data.get('items', []):
-                # if the PR is already in the PR list, skip
-                if review['html_url'] in existing_pr_urls:
+        self.client = GitHubClient(self.headers)
+
+    async def close(self):
+        await self.client.close()
+
+    def _build_query(self, searches: Dict[str, Dict]) -> Tuple[str, Dict]:
+        """One GraphQL query running every pending search under its own alias"""
+        definitions = ['$first: Int!']
+        selections = []
+        variables = {'first': self.page_size}
+        for index, (alias, search) in enumerate(searches.items()):
+            definitions += [f'$q{index}: String!', f'$after{index}: String']
+            variables.update({f'q{index}': search['query'], f'after{index}': search['cursor']})
+            if search['reviewer']:
+                definitions.append(f'$login{index}: String')
+                variables[f'login{index}'] = search['reviewer']
+                fields = REVIEWED_FIELDS.replace('LOGIN', f'$login{index}').replace('REVIEWS', str(self.PR_REVIEWS))
+            else:
+                fields = AUTHORED_FIELDS.replace('COMMITS', str(self.PR_COMMITS))
+            selections.append(f"""
+    {alias}: search(query: $q{index}, type: ISSUE, first: $first, after: $after{index}) {{
+      issueCount
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{{fields}
+      }}
+    }}""")
+        query = f"query({', '.join(definitions)}) {{{''.join(selections)}\n    rateLimit {{ cost remaining }}\n}}"
+        return query, variables
+
+    async def _search_all(self, searches: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+        """Run aliased searches together, one request per page of all unfinished searches"""
+        results = {alias: [] for alias in searches}
+        pending = {alias: {**search, 'cursor': None} for alias, search in searches.items()}
+        requests = total_bytes = 0
+        while pending:
+            query, variables = self._build_query(pending)
+            data, size = await self.client.graphql(query, variables)
+            requests += 1
+            total_bytes += size
+            logger.debug(f"GitHub GraphQL query cost {data['rateLimit']['cost']}, {data['rateLimit']['remaining']} points left")
+
+            for alias in list(pending):
+                page = data[alias]
+                results[alias].extend(node for node in page['nodes'] if node)
+                if page['pageInfo']['hasNextPage'] and len(results[alias]) < self.SEARCH_MAX_RESULTS:
+                    pending[alias]['cursor'] = page['pageInfo']['endCursor']
                     continue
-                    
+                if page['issueCount'] > self.SEARCH_MAX_RESULTS:
+                    logger.warning(f"GitHub search '{pending[alias]['query']}' matched {page['issueCount']} items, only the first {self.SEARCH_MAX_RESULTS} are available")
+                del pending[alias]
+
+        logger.info(f"GitHub GraphQL: {len(searches)} searches, {sum(map(len, results.values()))} PRs in {requests} requests, {total_bytes} bytes")
+        return results
+
+    async def _search_batched(self, searches: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+        """Split many searches into requests of SEARCHES_PER_QUERY aliases, run concurrently"""
+        aliases = list(searches)
+        chunks = [aliases[i:i + self.SEARCHES_PER_QUERY] for i in range(0, len(aliases), self.SEARCHES_PER_QUERY)]
+        results = {}
+        for chunk_results in await asyncio.gather(*(
+            self._search_all({alias: searches[alias] for alias in chunk}) for chunk in chunks
+        )):
+            results.update(chunk_results)
+        return results
+
+    @staticmethod
+    def _in_range(timestamp: Optional[str], start_date: datetime, end_date: datetime) -> bool:
+        # naive report windows are local time
+        return timestamp is not None and start_date.astimezone() <= parse_timestamp(timestamp) <= end_date.astimezone()
+
+    def _build_activities(self, username: str, authored: List[Dict], reviewed: List[Dict],
+                          start_date: datetime, end_date: datetime) -> List[Dict]:
+        """Convert authored and reviewed PRs into PR, commit and review activity dicts"""
+        login = username.lower()
+        activities = []
+        commit_oids = set()
+
+        for pr in authored:
+            repo = pr['repository']['name']
+            activities.append({
+                'type': 'pull_request',
+                'title': pr['title'],
+                'url': pr['url'],
+                'date': pr['createdAt'],
+                'updated': pr['updatedAt'],
+                'state': 'merged' if pr['merged'] else pr['state'].lower(),
+                'repo': repo,
+                'additions': pr['additions'],
+                'deletions': pr['deletions'],
+                'merged_at': pr['mergedAt'],
+                'review_decision': pr['reviewDecision']
+            })
+
+            # the user's own commits on the PR made in the date range, a commit can be on several PRs
+            for node in pr['commits']['nodes']:
+                commit = node['commit']
+                author = (commit['author'] or {}).get('user') or {}
+                if (author.get('login') or '').lower() != login or commit['oid'] in commit_oids:
+                    continue
+                if not self._in_range(commit['committedDate'], start_date, end_date):
+                    continue
+                commit_oids.add(commit['oid'])
                 activities.append({
-                    'type': 'review',
-                    'title': review['title'],
-                    'url': review['html_url'],
-                    'date': review['updated_at'],
-                    'state': review['state'],
-                    'repo': review['repository_url'].split('/')[-1]
+                    'type': 'commit',
+                    'message': commit['message'].split('\n', 1)[0],
+                    'url': commit['url'],
+                    'date': commit['committedDate'],
+                    'updated': commit['committedDate'],
+                    'state': '',
+                    'repo': repo,
+                    'additions': commit['additions'],
+                    'deletions': commit['deletions'],
+                    'pull_request': pr['url']
                 })
-            
-            # sort by time
-            activities.sort(key=lambda x: x['date'], reverse=True)
-            return activities
-            
+
+        # get the existing PR URL set
+        existing_pr_urls = {pr['url'] for pr in authored}
+
+        for pr in reviewed:
+            # if the PR is already in the PR list, skip
+            if pr['url'] in existing_pr_urls:
+                continue
+            # the PR may have been updated in the date range while the reviews are older
+            reviews = [review for review in pr['reviews']['nodes'] if self._in_range(review['submittedAt'], start_date, end_date)]
+            if not reviews:
+                continue
+            latest = max(reviews, key=lambda review: review['submittedAt'])
+
+            activities.append({
+                'type': 'review',
+                'title': pr['title'],
+                'url': pr['url'],
+                'date': latest['submittedAt'],
+                'updated': latest['submittedAt'],
+                'state': latest['state'].lower(),
+                'repo': pr['repository']['name'],
+                'additions': pr['additions'],
+                'deletions': pr['deletions'],
+                'pr_state': 'merged' if pr['merged'] else pr['state'].lower(),
+                'reviews': len(reviews)
+            })
+
+        # sort by time
+        activities.sort(key=lambda x: x['date'], reverse=True)
+        return activities
+
+    @staticmethod
+    def _date_range(start_date: datetime, end_date: datetime) -> str:
+        return f"{start_date.strftime('%Y-%m-%d')}..{end_date.strftime('%Y-%m-%d')}"
+
+    async def fetch_activities(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        """Fetch authored PRs with their commits and reviewed PRs updated in the date range, raising on API errors"""
+        date_range = self._date_range(start_date, end_date)
+
+        # both searches share every request
+        results = await self._search_all({
+            'authored': {'query': f"type:pr author:{self.username} updated:{date_range}", 'reviewer': None},
+            'reviewed': {'query': f"type:pr reviewed-by:{self.username} updated:{date_range}", 'reviewer': self.username}
+        })
+        return self._build_activities(self.username, results['authored'], results['reviewed'], start_date, end_date)
+
+    async def fetch_team_activities(self, usernames: List[str], start_date: datetime, end_date: datetime) -> Dict[str, List[Dict]]:
+        """Fetch PR activity for several users and split it per user
+
+        Authored PRs are searched with several author: qualifiers per query (the search
+        ORs them) and split by the PR author. Search results do not say who reviewed a
+        PR, so reviews are one search per user; all searches are batched into a few
+        GraphQL requests.
+        """
+        date_range = self._date_range(start_date, end_date)
+        batches = [usernames[i:i + self.TEAM_AUTHOR_BATCH] for i in range(0, len(usernames), self.TEAM_AUTHOR_BATCH)]
+
+        searches = {
+            f"authored{index}": {
+                'query': f"type:pr {' '.join(f'author:{username}' for username in batch)} updated:{date_range}",
+                'reviewer': None
+            }
+            for index, batch in enumerate(batches)
+        }
+        searches.update({
+            f"reviewed{index}": {'query': f"type:pr reviewed-by:{username} updated:{date_range}", 'reviewer': username}
+            for index, username in enumerate(usernames)
+        })
+        results = await self._search_batched(searches)
+
+        pr_items_by_user = {username.lower(): [] for username in usernames}
+        for index in range(len(batches)):
+            for pr in results[f"authored{index}"]:
+                login = (pr.get('author') or {}).get('login', '').lower()
+                if login in pr_items_by_user:
+                    pr_items_by_user[login].append(pr)
+
+        return {
+            username: self._build_activities(
+                username, pr_items_by_user[username.lower()], results[f"reviewed{index}"], start_date, end_date
+            )
+            for index, username in enumerate(usernames)
+        }
+
+    async def get_weekly_activities(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        try:
+            return await self.fetch_activities(start_date, end_date)
         except Exception as e:
             logger.error(f"Error fetching GitHub data: {str(e)}")
-            return []
\ No newline at end of file
+            return []
@@ -1,83 +1,263 @@
-from jira import JIRA
 import os
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Set, Tuple
 import asyncio
 import logging
+import math
+import threading
+from services.activity import parse_timestamp
+from services.metrics import UPSTREAM_REQUESTS
 
 logger = logging.getLogger(__name__)
 
 class JiraService:
+    # only the fields read by _build_activity, and by _issue_events when events are fetched
+    SEARCH_FIELDS = "summary,status,updated,issuetype,assignee,customfield_12310243"
+    EVENT_FIELDS = ",comment,worklog"
+    # characters of a comment shown in the report
+    COMMENT_EXCERPT = 120
+    
     def __init__(self):
         self.server = os.getenv('JIRA_SERVER')
         self.token = os.getenv('JIRA_API_TOKEN')
         self.email = os.getenv('JIRA_EMAIL')
+        self.page_size = int(os.getenv('JIRA_PAGE_SIZE', '100'))
+        self.max_parallel_pages = int(os.getenv('JIRA_MAX_PARALLEL_PAGES', '4'))
+        # the user's status changes, comments and worklogs as activities of their own
+        self.include_events = os.getenv('JIRA_INCLUDE_EVENTS', 'true').lower() == 'true'
         
         if not all([self.server, self.token, self.email]):
             raise ValueError("Missing required Jira configuration. Please check JIRA_SERVER, JIRA_API_TOKEN, and JIRA_EMAIL environment variables.")
         
-        try:
-            self.jira = JIRA(
-                server=self.server,
-                token_auth=self.token
-            )
-            self.current_user = self.email
-            logger.info("Jira service initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize Jira service: {str(e)}")
-            raise
+        self.current_user = self.email
+        self._jira = None
+        self._jira_lock = threading.Lock()
     
-    def _get_user_email(self, user_obj):
-        """Safely get user email"""
-        if not user_obj:
-            return None
-        try:
-            if hasattr(user_obj, 'emailAddress'):
-                return user_obj.emailAddress
-            elif hasattr(user_obj, 'email'):
-                return user_obj.email
-            elif hasattr(user_obj, 'name'):
-                return user_obj.name
-            return None
-        except Exception as e:
-            logger.warning(f"Failed to get user email: {str(e)}")
+    @property
+    def jira(self):
+        """Jira client, connected on first use so that an unreachable server does not fail startup
+        
+        A failed connection is retried on the next use.
+        """
+        with self._jira_lock:
+            if self._jira is None:
+                # the jira package is slow to import, load it only when Jira is actually used
+                from jira import JIRA
+                try:
+                    self._jira = JIRA(
+                        server=self.server,
+                        token_auth=self.token
+                    )
+                    logger.info("Jira client connected successfully")
+                except Exception as e:
+                    logger.error(f"Failed to connect to Jira: {str(e)}")
+                    raise
+            return self._jira
+    
+    @staticmethod
+    def _get_user_email(user: Optional[Dict]) -> Optional[str]:
+        """Email of a user from the search JSON, or its name when the email is hidden"""
+        if not user:
             return None
+        return user.get('emailAddress') or user.get('email') or user.get('name')
     
-    async def get_weekly_activities(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+    @staticmethod
+    def _identities(user: Optional[Dict]) -> Set[str]:
+        """Every way the JQL user clauses may have named this user, lowercased"""
+        if not user:
+            return set()
+        return {str(user[field]).lower() for field in ('emailAddress', 'name', 'key', 'accountId') if user.get(field)}
+    
+    def _build_activity(self, issue: Dict) -> Dict:
+        """Convert a Jira issue into an activity dict"""
+        fields = issue['fields']
+        return {
+            'key': issue['key'],
+            'summary': fields['summary'],
+            'status': fields['status']['name'],
+            'updated': fields['updated'],
+            'type': fields['issuetype']['name'],
+            'assignee': self._get_user_email(fields.get('assignee')),
+            # QA Contact
+            'qa_contact': self._get_user_email(fields.get('customfield_12310243'))
+        }
+    
+    @classmethod
+    def _excerpt(cls, text) -> str:
+        # comments are plain text in API v2, keep the first line for the report
+        first_line = text.strip().split('\n', 1)[0] if isinstance(text, str) else ''
+        return first_line if len(first_line) <= cls.COMMENT_EXCERPT else first_line[:cls.COMMENT_EXCERPT - 3] + '...'
+    
+    def _issue_events(self, issue: Dict) -> Iterator[Tuple[Optional[Dict], str, str, Dict]]:
+        """(author, id, time, fields) of every status change, comment and worklog of an issue, lazily"""
+        for history in issue.get('changelog', {}).get('histories', []):
+            for item in history.get('items', []):
+                if item.get('field') == 'status':
+                    yield history.get('author'), f"changelog-{history['id']}", history['created'], {
+                        'type': 'Status Change',
+                        'status': item.get('toString'),
+                        'detail': f"{item.get('fromString')} -> {item.get('toString')}"
+                    }
+        for comment in (issue['fields'].get('comment') or {}).get('comments', []):
+            yield comment.get('author'), f"comment-{comment['id']}", comment['created'], {
+                'type': 'Comment',
+                'detail': self._excerpt(comment.get('body'))
+            }
+        for worklog in (issue['fields'].get('worklog') or {}).get('worklogs', []):
+            yield worklog.get('author'), f"worklog-{worklog['id']}", worklog['started'], {
+                'type': 'Work Log',
+                'detail': worklog.get('timeSpent'),
+                'time_spent_seconds': worklog.get('timeSpentSeconds')
+            }
+    
+    def _issue_activities(self, issue: Dict, users: Dict[str, str], start_date: datetime,
+                          end_date: datetime) -> Iterator[Tuple[str, Dict]]:
+        """(user, activity) pairs of an issue
+        
+        The issue itself is listed for its assignee and QA Contact, and every status
+        change, comment and worklog in the date range for the user who made it.
+        Events are generated one at a time, so long histories are never copied.
+        """
+        activity = self._build_activity(issue)
+        for identity in {(activity['assignee'] or '').lower(), (activity['qa_contact'] or '').lower()}:
+            if identity in users:
+                yield users[identity], activity
+        
+        if not self.include_events:
+            return
+        since, until = start_date.astimezone(), end_date.astimezone()
+        for author, event_id, created, fields in self._issue_events(issue):
+            owners = {users[identity] for identity in self._identities(author) if identity in users}
+            if not owners or not since <= parse_timestamp(created) <= until:
+                continue
+            event = {
+                **activity,
+                'key': f"{issue['key']}#{event_id}",
+                'issue': issue['key'],
+                'updated': created,
+                **fields
+            }
+            for owner in owners:
+                yield owner, event
+        
+        self._warn_truncated(issue)
+    
+    @staticmethod
+    def _warn_truncated(issue: Dict):
+        """Warn when a search result capped an issue's embedded changelog, comments or worklogs
+        
+        The missing events are not fetched, so the user's older events on a busy issue
+        can be left out of the report.
+        """
+        fields = issue['fields']
+        for name, container, entries in (
+            ('changelog', issue.get('changelog'), 'histories'),
+            ('comments', fields.get('comment'), 'comments'),
+            ('worklogs', fields.get('worklog'), 'worklogs')
+        ):
+            container = container or {}
+            returned = len(container.get(entries, []))
+            if container.get('total', 0) > returned:
+                logger.warning(f"{name.capitalize()} of {issue['key']} truncated to {returned} of {container['total']} entries, "
+                               f"events beyond them are not in the report")
+    
+    async def _search_page(self, jql: str, start_at: int) -> Dict:
+        """Fetch one page of issues as JSON with only the fields the report needs, off the event loop"""
+        # the client is resolved in the worker thread too, connecting to Jira blocks
+        def search():
+            return self.jira.search_issues(
+                jql,
+                startAt=start_at,
+                maxResults=self.page_size,
+                fields=self.SEARCH_FIELDS + (self.EVENT_FIELDS if self.include_events else ''),
+                # changelogs come with the page instead of one request per issue
+                expand='changelog' if self.include_events else None,
+                # raw JSON skips building client objects for every changelog entry
+                json_result=True
+            )
+        
         try:
-            # Build JQL query
-            jql = f'updated >= "{start_date.strftime("%Y-%m-%d")}" AND updated <= "{end_date.strftime("%Y-%m-%d")}" AND (assignee = "{self.current_user}" OR "QA Contact" = "{self.current_user}")'
-            logger.debug(f"Executing JQL query: {jql}")
-            
-            # Get issues
-            issues = self.jira.search_issues(jql, maxResults=100)
-            logger.info(f"Found {len(issues)} Jira issues")
-            
-            activities = []
-            for issue in issues:
+            page = await asyncio.to_thread(search)
+        except Exception:
+            UPSTREAM_REQUESTS.inc(service='jira', resource='search', status='error')
+            raise
+        UPSTREAM_REQUESTS.inc(service='jira', resource='search', status='ok')
+        return page
+    
+    async def _search_activities(self, jql: str, users: List[str], start_date: datetime,
+                                 end_date: datetime) -> Dict[str, List[Dict]]:
+        """Activities of each user found by a JQL search, newest first
+        
+        The remaining pages are fetched in parallel once the total is known, and each
+        page is reduced to activities as it arrives, so only the activities are kept.
+        """
+        users_by_identity = {user.lower(): user for user in users}
+        activities_by_user = {user: [] for user in users}
+        
+        def collect(page: Dict):
+            for issue in page.get('issues', []):
                 try:
-                    # Get assignee email
-                    assignee_email = self._get_user_email(issue.fields.assignee)
-                    
-                    # Get QA Contact email
-                    qa_contact_email = None
-                    if hasattr(issue.fields, 'customfield_12310243'):
-                        qa_contact_email = self._get_user_email(issue.fields.customfield_12310243)
-                    
-                    activities.append({
-                        'key': issue.key,
-                        'summary': issue.fields.summary,
-                        'status': issue.fields.status.name,
-                        'updated': issue.fields.updated,
-                        'type': issue.fields.issuetype.name,
-                        'assignee': assignee_email,
-                        'qa_contact': qa_contact_email
-                    })
+                    for user, activity in self._issue_activities(issue, users_by_identity, start_date, end_date):
+                        activities_by_user[user].append(activity)
                 except Exception as e:
-                    logger.error(f"Error processing issue {issue.key}: {str(e)}")
-                    continue
-            
-            return activities
+                    logger.error(f"Error processing issue {issue.get('key')}: {str(e)}")
+        
+        first_page = await self._search_page(jql, 0)
+        collect(first_page)
+        total = first_page.get('total', 0)
+        del first_page
+        
+        semaphore = asyncio.Semaphore(self.max_parallel_pages)
+        
+        async def fetch(page_index: int):
+            async with semaphore:
+                return await self._search_page(jql, page_index * self.page_size)
+        
+        page_count = max(1, math.ceil(total / self.page_size))
+        # build activities as each page arrives instead of waiting for all of them
+        for next_page in asyncio.as_completed([fetch(index) for index in range(1, page_count)]):
+            collect(await next_page)
+        
+        for activities in activities_by_user.values():
+            activities.sort(key=lambda activity: parse_timestamp(activity['updated']), reverse=True)
+        logger.info(f"Found {total} Jira issues in {page_count} pages, {sum(map(len, activities_by_user.values()))} activities")
+        return activities_by_user
+    
+    def _build_jql(self, user_clause: str, start_date: datetime, end_date: datetime) -> str:
+        return f'updated >= "{start_date.strftime("%Y-%m-%d %H:%M")}" AND updated <= "{end_date.strftime("%Y-%m-%d %H:%M")}" AND ({user_clause}) ORDER BY updated DESC'
+    
+    def _user_clause(self, users: List[str], start_date: datetime) -> str:
+        """Issues the users are assigned to or QA Contact of, and with events also the ones they worked on"""
+        user_list = ", ".join(f'"{user}"' for user in users)
+        clauses = [f'assignee in ({user_list})', f'"QA Contact" in ({user_list})']
+        if self.include_events:
+            # comments cannot be searched by author, status changes and worklogs can
+            clauses.append(f'worklogAuthor in ({user_list})')
+            clauses += [f'status CHANGED BY "{user}" AFTER "{start_date.strftime("%Y-%m-%d %H:%M")}"' for user in users]
+        return " OR ".join(clauses)
+    
+    async def fetch_activities(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        """Fetch the user's issues and own events updated in the date range, raising on API errors"""
+        # Build JQL query
+        jql = self._build_jql(self._user_clause([self.current_user], start_date), start_date, end_date)
+        logger.debug(f"Executing JQL query: {jql}")
+        
+        return (await self._search_activities(jql, [self.current_user], start_date, end_date))[self.current_user]
+    
+    async def fetch_team_activities(self, users: List[str], start_date: datetime, end_date: datetime) -> Dict[str, List[Dict]]:
+        """Fetch issues for several users with one bulk JQL query and split them per user
+        
+        An issue is listed for every user that is its assignee or QA Contact, and each
+        status change, comment and worklog for the user who made it.
+        """
+        jql = self._build_jql(self._user_clause(users, start_date), start_date, end_date)
+        logger.debug(f"Executing team JQL query: {jql}")
+        
+        return await self._search_activities(jql, users, start_date, end_date)
+    
+    async def get_weekly_activities(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        try:
+            return await self.fetch_activities(start_date, end_date)
         except Exception as e:
             logger.error(f"Error fetching Jira data: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
@@ -0,0 +1,126 @@
+from contextlib import closing
+from typing import Dict, Optional
+import hashlib
+import os
+import sqlite3
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """Persistent content-addressed cache of generated AI reports
+
+    Entries are keyed by a hash of everything that determines the output (the
+    formatted activities, the prompt templates and the model name), so a model or
+    prompt change never serves a stale report. Entries expire after a TTL and the
+    least recently used ones are evicted beyond the entry and size limits.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('LLM_CACHE_PATH', 'data/llm_cache.db')
+        self.ttl = float(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+        self.max_entries = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '500'))
+        self.max_bytes = int(os.getenv('LLM_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # every worker process reads and writes this database, WAL keeps readers from blocking the writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            # separator so that ("ab", "c") and ("a", "bc") hash differently
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def contains(self, key: str) -> bool:
+        """Whether a valid entry exists, without counting a hit or refreshing its LRU position"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM llm_cache WHERE key = ? AND created_at > ?", (key, time.time() - self.ttl)
+            ).fetchone()
+        return row is not None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                INSERT INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = excluded.value, size = excluded.size,
+                    created_at = excluded.created_at, accessed_at = excluded.accessed_at
+            """, (key, value, size, now, now))
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired entries, then the least recently used ones until within the limits"""
+        conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+        entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall():
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            entries -= 1
+            total_bytes -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} LLM cache entries")
+
+    def stats(self) -> Dict:
+        with closing(self._connect()) as conn:
+            entries, total_bytes, oldest = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created_at) FROM llm_cache"
+            ).fetchone()
+        return {
+            'entries': entries,
+            'bytes': total_bytes,
+            'oldest_entry_age': time.time() - oldest if oldest is not None else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl
+        }
+
+    def clear(self) -> int:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM llm_cache").rowcount
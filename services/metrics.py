@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+import bisect
+import threading
+import time
+
+# default buckets in seconds, from fast store reads up to slow LLM generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self.lock:
+            for key, value in self.values.items():
+                lines.append(f"{self.name}{self._format_labels(key)} {value}")
+        return lines
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts, total, count = self.values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            self.values[key] = [counts, total + value, count + 1]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self.lock:
+            for key, (counts, total, count) in self.values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', repr(float(bound))))} {cumulative}")
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+REGISTRY: List[_Metric] = []
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+STAGE_DURATION = Histogram('weeklybot_stage_duration_seconds', 'Duration of report generation stages', ['stage'])
+HTTP_REQUEST_DURATION = Histogram('weeklybot_http_request_duration_seconds', 'Duration of requests to this service', ['method', 'route', 'status'])
+UPSTREAM_REQUESTS = Counter('weeklybot_upstream_requests_total', 'Requests sent to Jira and GitHub', ['service', 'resource', 'status'])
+UPSTREAM_BYTES = Counter('weeklybot_upstream_response_bytes_total', 'Response bytes received from Jira and GitHub', ['service', 'resource'])
+LLM_TOKENS = Counter('weeklybot_llm_tokens_total', 'Tokens processed by the LLM', ['model', 'kind'])
+LLM_TOKENS_PER_SECOND = Histogram(
+    'weeklybot_llm_tokens_per_second', 'LLM completion throughput', ['model'],
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+)
+LLM_LOAD_DURATION = Histogram('weeklybot_llm_load_duration_seconds', 'Time Ollama spent loading the model before a generation', ['model'])
+
+# stage timings of the current request, reported in its Server-Timing header
+request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_timings', default=None)
+
+@contextmanager
+def span(stage: str):
+    """Time a stage into the stage histogram and the current request's Server-Timing"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=stage)
+        timings = request_timings.get()
+        if timings is not None:
+            timings.append((stage, duration))
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    return ', '.join(f"{stage};dur={duration * 1000:.1f}" for stage, duration in timings)
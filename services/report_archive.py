@@ -0,0 +1,149 @@
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+import json
+import os
+import re
+import sqlite3
+import logging
+from services.activity import Activity
+
+logger = logging.getLogger(__name__)
+
+WEEK_PATTERN = re.compile(r'^(\d{4})-W(\d{2})$')
+PERIOD_PATTERN = re.compile(r'^(\d{4})-([QH])([1-4])$')
+
+def parse_week(week: str) -> Tuple[datetime, datetime]:
+    """Monday 00:00 and Sunday 23:59:59 (local time) of an ISO week like 2024-W07, raising ValueError if invalid"""
+    match = WEEK_PATTERN.match(week)
+    if not match:
+        raise ValueError(f"Invalid ISO week {week!r}, expected YYYY-Www")
+    start = datetime.combine(date.fromisocalendar(int(match.group(1)), int(match.group(2)), 1), datetime.min.time())
+    return start, start + timedelta(days=7, seconds=-1)
+
+def week_of(value: datetime) -> str:
+    year, week, _ = value.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def weeks_between(start_date: datetime, end_date: datetime) -> List[str]:
+    """ISO weeks whose Thursday falls in the date range, oldest first
+
+    This is how ISO 8601 assigns weeks to years, so consecutive quarters never share a week.
+    """
+    weeks = []
+    thursday = datetime.combine((start_date + timedelta(days=3 - start_date.weekday())).date(), datetime.min.time())
+    if thursday < datetime.combine(start_date.date(), datetime.min.time()):
+        thursday += timedelta(days=7)
+    while thursday <= end_date:
+        weeks.append(week_of(thursday))
+        thursday += timedelta(days=7)
+    return weeks
+
+def parse_period(period: str) -> Tuple[datetime, datetime]:
+    """First and last moment of a quarter (2024-Q3) or half year (2024-H2), raising ValueError if invalid"""
+    match = PERIOD_PATTERN.match(period)
+    if not match or (match.group(2) == 'H' and int(match.group(3)) > 2):
+        raise ValueError(f"Invalid period {period!r}, expected YYYY-Qn or YYYY-Hn")
+    year, months = int(match.group(1)), 3 if match.group(2) == 'Q' else 6
+    first_month = (int(match.group(3)) - 1) * months + 1
+    start = datetime(year, first_month, 1)
+    end = datetime(year + 1, 1, 1) if first_month + months > 12 else datetime(year, first_month + months, 1)
+    return start, end - timedelta(seconds=1)
+
+class ReportArchive:
+    """Persistent archive of weekly reports and their activities, keyed by user and ISO week
+
+    A completed week no longer changes, so once archived it is served without
+    contacting Jira, GitHub or the model, and longer retrospectives are assembled
+    from the archived weeks instead of fetching months of history.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('REPORT_ARCHIVE_PATH', 'data/report_archive.db')
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # every worker process reads and writes this database, WAL keeps readers from blocking the writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS weekly_reports (
+                    user TEXT NOT NULL,
+                    week TEXT NOT NULL,
+                    start TEXT NOT NULL,
+                    end TEXT NOT NULL,
+                    report TEXT NOT NULL,
+                    activities TEXT NOT NULL,
+                    ai_report TEXT,
+                    archived_at TEXT NOT NULL,
+                    PRIMARY KEY (user, week)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save_week(self, user: str, week: str, report: Dict, activities: List[Activity]):
+        """Archive a week's report and activities, keeping an AI report archived earlier"""
+        start, end = parse_week(week)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                INSERT INTO weekly_reports (user, week, start, end, report, activities, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user, week) DO UPDATE SET
+                    report = excluded.report, activities = excluded.activities, archived_at = excluded.archived_at
+            """, (
+                user, week, start.isoformat(), end.isoformat(),
+                json.dumps({key: value for key, value in report.items() if key != 'activities'}),
+                json.dumps([activity.to_record() for activity in activities]),
+                datetime.now().isoformat()
+            ))
+        logger.info(f"Archived week {week} of {user} with {len(activities)} activities")
+
+    def save_ai_report(self, user: str, week: str, ai_report: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE weekly_reports SET ai_report = ? WHERE user = ? AND week = ?", (ai_report, user, week))
+
+    @staticmethod
+    def _row_to_week(row) -> Dict:
+        week, report, activities, ai_report, archived_at = row
+        return {
+            'week': week,
+            'report': json.loads(report),
+            'activities': [Activity.from_record(record) for record in json.loads(activities)],
+            'ai_report': ai_report,
+            'archived_at': datetime.fromisoformat(archived_at)
+        }
+
+    def get_week(self, user: str, week: str) -> Optional[Dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("""
+                SELECT week, report, activities, ai_report, archived_at FROM weekly_reports
+                WHERE user = ? AND week = ?
+            """, (user, week)).fetchone()
+        return self._row_to_week(row) if row else None
+
+    def get_weeks(self, user: str, weeks: List[str]) -> Dict[str, Dict]:
+        """Archived weeks among the given ones, keyed by week"""
+        if not weeks:
+            return {}
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"""
+                SELECT week, report, activities, ai_report, archived_at FROM weekly_reports
+                WHERE user = ? AND week IN ({','.join('?' * len(weeks))})
+            """, (user, *weeks)).fetchall()
+        return {row[0]: self._row_to_week(row) for row in rows}
+
+    def list_weeks(self, user: str) -> List[Dict]:
+        """Summary of every archived week of a user, newest first"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("""
+                SELECT week, report, ai_report IS NOT NULL, archived_at FROM weekly_reports
+                WHERE user = ? ORDER BY week DESC
+            """, (user,)).fetchall()
+        return [{
+            'week': week,
+            'summary': json.loads(report)['summary'],
+            'has_ai_report': bool(has_ai_report),
+            'archived_at': archived_at
+        } for week, report, has_ai_report, archived_at in rows]
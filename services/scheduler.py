@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, Set
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CronSchedule:
+    """Minimal five-field cron expression (minute hour day-of-month month day-of-week)
+
+    Fields accept '*', numbers, ranges (1-5), lists (1,3) and steps (*/15, 0-30/10,
+    5/15 for every 15 from 5 on). Day of week is 0-7 with both 0 and 7 meaning Sunday.
+    An expression that never matches (0 0 30 2 *) is rejected up front.
+    """
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+        # raises ValueError now rather than in the scheduler task, where nobody would notice
+        self.next_run(datetime.now())
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-'))
+            else:
+                # like cron, a step after a single value runs to the end of the range
+                start, end = int(part), high if step else int(part)
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron field {field!r} out of range {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        day_match = day.day in self.days
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        # like cron, when both day fields are restricted either one may match
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_run(self, after: datetime) -> datetime:
+        """First matching minute strictly after the given time"""
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+class ReportScheduler:
+    """Pre-generates reports on a cron schedule and keeps the caches warm in between
+
+    The scheduled run refreshes the activity store and generates the AI report, so it
+    lands in the LLM cache before anyone asks for it. Refresh runs repeat the same
+    work periodically; thanks to incremental sync and the content-addressed cache they
+    only cost a model call when activities actually changed. An optional warm-up cron
+    loads the model ahead of the hours reports are usually asked for.
+    """
+    def __init__(self, run: Callable[[str], Awaitable[None]],
+                 warm_up: Optional[Callable[[str], Awaitable[None]]] = None):
+        self.run = run
+        self.cron = CronSchedule(os.getenv('REPORT_SCHEDULE_CRON', '0 8 * * 5'))
+        warm_up_cron = os.getenv('OLLAMA_WARM_UP_CRON')
+        self.warm_up = warm_up
+        self.warm_up_cron = CronSchedule(warm_up_cron) if warm_up and warm_up_cron else None
+        refresh_minutes = float(os.getenv('REPORT_REFRESH_MINUTES', '60'))
+        self.refresh_interval = refresh_minutes * 60 if refresh_minutes > 0 else None
+        self.lock = asyncio.Lock()
+        self.tasks = []
+        self.last_run: Optional[datetime] = None
+
+    def start(self):
+        self.tasks.append(asyncio.create_task(self._cron_loop()))
+        if self.refresh_interval:
+            self.tasks.append(asyncio.create_task(self._refresh_loop()))
+        if self.warm_up_cron:
+            self.tasks.append(asyncio.create_task(self._warm_up_loop()))
+        logger.info(f"Report scheduler started, cron '{self.cron.expression}', refresh every {self.refresh_interval}s")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def run_once(self, reason: str):
+        if self.lock.locked():
+            logger.info(f"Skipping {reason} report run, previous run still in progress")
+            return
+        async with self.lock:
+            started = datetime.now()
+            try:
+                await self.run(reason)
+                self.last_run = started
+                logger.info(f"{reason.capitalize()} report run finished in {(datetime.now() - started).total_seconds():.1f}s")
+            except Exception as e:
+                logger.error(f"{reason.capitalize()} report run failed: {str(e)}")
+
+    async def _cron_loop(self):
+        while True:
+            next_run = self.cron.next_run(datetime.now())
+            await asyncio.sleep(max((next_run - datetime.now()).total_seconds(), 0))
+            await self.run_once('scheduled')
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.run_once('refresh')
+
+    async def _warm_up_loop(self):
+        while True:
+            next_run = self.warm_up_cron.next_run(datetime.now())
+            await asyncio.sleep(max((next_run - datetime.now()).total_seconds(), 0))
+            await self.warm_up('scheduled')
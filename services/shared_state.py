@@ -0,0 +1,165 @@
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, closing
+from typing import AsyncIterator, Dict, Optional
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SharedState(ABC):
+    """State shared by every worker process of the app
+
+    Leases let one worker at a time run a job (a source sync, an AI generation) while
+    the others wait for its result, and records with a time to live carry job progress
+    between workers. The operations map onto a Redis-like store (SET NX PX, GET, SET PX,
+    DEL): SQLiteSharedState is the default, another store plugs in by implementing
+    acquire, release, get, put, put_if_absent and delete.
+    """
+    def __init__(self):
+        # a lease or an unfinished job's record expires this long after its holder stopped renewing it
+        self.lease_ttl = float(os.getenv('SHARED_LEASE_TTL', '30'))
+        # how often waiting workers look again, and how often job progress is published
+        self.poll_interval = float(os.getenv('SHARED_STATE_POLL_INTERVAL', '0.2'))
+
+    @abstractmethod
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take the lease, or extend it when owner already holds it; False while someone else holds it"""
+
+    @abstractmethod
+    def release(self, name: str, owner: str):
+        """Give the lease up if owner holds it"""
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        """The live record, None when it is missing or expired"""
+
+    @abstractmethod
+    def put(self, namespace: str, key: str, value: Dict, ttl: float):
+        """Store the record, replacing any other, for ttl seconds"""
+
+    @abstractmethod
+    def put_if_absent(self, namespace: str, key: str, value: Dict, ttl: float) -> Dict:
+        """Store the value unless a live one exists, and return whichever is stored"""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        """Remove the record"""
+
+    @asynccontextmanager
+    async def lease(self, name: str) -> AsyncIterator[bool]:
+        """Hold a lease for the duration of the block, waiting while another worker holds it
+
+        Yields whether it had to wait, in which case the other worker may just have
+        done the same work. The lease is renewed while held and expires on its own
+        when this process dies.
+        """
+        owner = uuid.uuid4().hex
+        waited = False
+        # most leases guard a quick sync, look again soon and back off to poll_interval
+        delay = 0.01
+        while not await asyncio.to_thread(self.acquire, name, owner, self.lease_ttl):
+            waited = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.poll_interval)
+
+        async def renew():
+            while True:
+                await asyncio.sleep(self.lease_ttl / 3)
+                await asyncio.to_thread(self.acquire, name, owner, self.lease_ttl)
+
+        renewal = asyncio.create_task(renew())
+        try:
+            yield waited
+        finally:
+            renewal.cancel()
+            await asyncio.to_thread(self.release, name, owner)
+
+class SQLiteSharedState(SharedState):
+    """Shared state in a SQLite database in WAL mode, for workers on the same host"""
+    def __init__(self, path: Optional[str] = None):
+        super().__init__()
+        self.path = path or os.getenv('SHARED_STATE_PATH', 'data/shared_state.db')
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # readers do not block the writer, workers poll this database all the time
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS records (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_records_expires ON records (expires_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        # leases and job progress are short-lived, WAL stays consistent without a sync on every commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute("""
+                INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.owner = excluded.owner OR leases.expires_at <= ?
+            """, (name, owner, now + ttl, now))
+            return cursor.rowcount > 0
+
+    def release(self, name: str, owner: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM records WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, namespace: str, key: str, value: Dict, ttl: float):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                INSERT INTO records (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+            """, (namespace, key, json.dumps(value), now + ttl))
+            conn.execute("DELETE FROM records WHERE expires_at <= ?", (now,))
+
+    def put_if_absent(self, namespace: str, key: str, value: Dict, ttl: float) -> Dict:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            # the insert takes the write lock, so the read below sees the winner of a race
+            cursor = conn.execute("""
+                INSERT INTO records (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+                WHERE records.expires_at <= ?
+            """, (namespace, key, json.dumps(value), now + ttl, now))
+            if cursor.rowcount > 0:
+                return value
+            row = conn.execute("SELECT value FROM records WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        return json.loads(row[0])
+
+    def delete(self, namespace: str, key: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM records WHERE namespace = ? AND key = ?", (namespace, key))
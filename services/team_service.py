@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import List, Dict, Callable, Optional
+import asyncio
+import json
+import os
+import logging
+from services.activity import normalize_activities
+
+logger = logging.getLogger(__name__)
+
+def load_roster(path: Optional[str] = None) -> List[Dict]:
+    """Load the team roster, a JSON list of {"name", "jira", "github"} entries"""
+    path = path or os.getenv('TEAM_ROSTER_PATH', 'team.json')
+    with open(path, encoding='utf-8') as f:
+        roster = json.load(f)
+
+    for member in roster:
+        if not member.get('name'):
+            raise ValueError(f"Team roster entry without a name in {path}: {member}")
+    return roster
+
+class TeamReportService:
+    """Build reports for a whole team in one run
+
+    Activities are fetched with one bulk query per source and split per member;
+    the AI summaries run through a bounded pool so the local LLM is not overloaded.
+    """
+    def __init__(self, jira_service, github_service, report_service, ai_report_service, llm_queue=None):
+        self.jira_service = jira_service
+        self.github_service = github_service
+        self.report_service = report_service
+        self.ai_report_service = ai_report_service
+        self.llm_concurrency = int(os.getenv('TEAM_LLM_CONCURRENCY', '2'))
+        # shared LLM job queue of the web service, team summaries then wait behind interactive reports
+        self.llm_queue = llm_queue
+
+    async def generate_team_reports(self, members: List[Dict], start_date: datetime, end_date: datetime,
+                                    on_report: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """Generate the regular and AI report of every member, calling on_report as each one finishes"""
+        jira_users = [member['jira'] for member in members if member.get('jira')]
+        github_users = [member['github'] for member in members if member.get('github')]
+
+        jira_by_user, github_by_user = await asyncio.gather(
+            self.jira_service.fetch_team_activities(jira_users, start_date, end_date) if jira_users else asyncio.sleep(0, {}),
+            self.github_service.fetch_team_activities(github_users, start_date, end_date) if github_users else asyncio.sleep(0, {})
+        )
+        logger.info(f"Fetched team activities for {len(members)} members")
+
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+
+        async def build(member: Dict) -> Dict:
+            activities = normalize_activities(
+                jira_by_user.get(member.get('jira'), []),
+                github_by_user.get(member.get('github'), [])
+            )
+            result = {
+                'name': member['name'],
+                'report': self.report_service.generate_report(activities),
+                'ai_report': None
+            }
+            try:
+                async with semaphore:
+                    if self.llm_queue is not None:
+                        ai_report = await self.llm_queue.run(
+                            self.llm_queue.TEAM, lambda: self.ai_report_service.generate_ai_report(activities)
+                        )
+                    else:
+                        ai_report = await self.ai_report_service.generate_ai_report(activities)
+                result['ai_report'] = ai_report['ai_report']
+            except Exception as e:
+                logger.error(f"Error generating AI report for {member['name']}: {str(e)}")
+                result['error'] = str(e)
+
+            if on_report is not None:
+                on_report(result)
+            return result
+
+        return await asyncio.gather(*(build(member) for member in members))
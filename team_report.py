@@ -0,0 +1,46 @@
+"""Generate weekly reports for everyone in the team roster from the command line"""
+import argparse
+import asyncio
+import os
+import re
+import logging
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from services.jira_service import JiraService
+from services.github_service import GitHubService
+from services.report_service import ReportService
+from services.ai_report_service import AIReportService
+from services.team_service import TeamReportService, load_roster
+
+logger = logging.getLogger(__name__)
+
+async def run(args):
+    members = load_roster(args.roster)
+    github_service = GitHubService()
+    team_report_service = TeamReportService(JiraService(), github_service, ReportService(), AIReportService())
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=args.days)
+    os.makedirs(args.output, exist_ok=True)
+
+    def save(result):
+        # names come from the roster file, keep them from reaching outside the output directory
+        path = os.path.join(args.output, f"{re.sub(r'[^\w.-]', '_', result['name'])}.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(result['ai_report'] or f"Report generation failed: {result.get('error')}")
+        logger.info(f"Saved report for {result['name']} to {path}")
+
+    try:
+        await team_report_service.generate_team_reports(members, start_date, end_date, save)
+    finally:
+        await github_service.close()
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Generate weekly reports for a whole team")
+    parser.add_argument('--roster', help="team roster JSON file (default TEAM_ROSTER_PATH or team.json)")
+    parser.add_argument('--days', type=int, default=14, help="number of days to report on")
+    parser.add_argument('--output', default='reports', help="directory the markdown reports are written to")
+    asyncio.run(run(parser.parse_args()))
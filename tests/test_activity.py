@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from services.activity import Activity, ActivityIndex
+
+START = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+def activity(source: str, hours: int, key: str) -> Activity:
+    return Activity(source, 'Task', START + timedelta(hours=hours), key, key, 'Done', 'ABC')
+
+def pages(index: ActivityIndex, limit: int, **filters):
+    cursor, result = None, []
+    while True:
+        page, cursor, total = index.page(cursor=cursor, limit=limit, **filters)
+        result.append([item.key for item in page])
+        if cursor is None:
+            return result, total
+
+def test_pages_newest_first_until_the_last():
+    index = ActivityIndex([activity('jira', hours, f"J-{hours}") for hours in range(5)])
+    assert pages(index, 2) == ([['J-4', 'J-3'], ['J-2', 'J-1'], ['J-0']], 5)
+
+def test_source_and_date_filters():
+    activities = [activity('jira', hours, f"J-{hours}") for hours in range(4)]
+    activities += [activity('github', hours, f"G-{hours}") for hours in range(4)]
+    index = ActivityIndex(activities)
+    assert pages(index, 10, source='github') == ([['G-3', 'G-2', 'G-1', 'G-0']], 4)
+    filtered = pages(index, 10, source='jira', start=START + timedelta(hours=1), end=START + timedelta(hours=2))
+    assert filtered == ([['J-2', 'J-1']], 2)
+
+def test_same_time_activities_are_neither_skipped_nor_repeated():
+    index = ActivityIndex([activity('jira', 0, f"J-{number}") for number in range(5)])
+    result, _ = pages(index, 2)
+    assert sorted(key for page in result for key in page) == [f"J-{number}" for number in range(5)]
+
+def test_cursor_survives_a_rebuilt_index():
+    activities = [activity('jira', hours, f"J-{hours}") for hours in range(4)]
+    _, cursor, _ = ActivityIndex(activities).page(limit=2)
+    rebuilt = ActivityIndex(activities + [activity('jira', 10, 'J-new')])
+    assert [item.key for item in rebuilt.page(cursor=cursor, limit=2)[0]] == ['J-1', 'J-0']
+
+def test_malformed_cursor():
+    with pytest.raises(ValueError):
+        ActivityIndex([]).page(cursor='not a cursor')
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+import json
+import pytest
+from services.activity import Activity
+from services.activity_classifier import ActivityClassifier, load_status_buckets
+
+NOW = datetime(2026, 10, 16, tzinfo=timezone.utc)
+
+def jira(key: str, status: str, hours: int = 0, kind: str = 'Story', detail: str = None) -> Activity:
+    return Activity('jira', kind, NOW - timedelta(hours=hours), key, f"Issue {key.split('#')[0]}", status, key.split('-')[0], detail=detail)
+
+def github(kind: str, url: str, title: str, status: str, hours: int = 0, parent: str = None) -> Activity:
+    return Activity('github', kind, NOW - timedelta(hours=hours), url, title, status, 'app', url=url,
+                    additions=10, deletions=2, parent=parent)
+
+@pytest.fixture
+def classifier(tmp_path):
+    return ActivityClassifier(load_status_buckets(str(tmp_path / 'missing.json')))
+
+def keys(classified):
+    return {bucket: {group: [item.key for item in items] for group, items in groups.items()}
+            for bucket, groups in classified.items()}
+
+def test_buckets_by_status_and_state(classifier):
+    classified = classifier.classify([
+        jira('ABC-1', 'Done', 1),
+        jira('ABC-2', 'In Progress', 2),
+        jira('ABC-3', 'To Do', 3),
+        github('pull_request', 'https://github.com/o/app/pull/1', 'Refactor', 'merged', 4),
+        github('review', 'https://github.com/o/app/pull/2', 'Other', 'changes_requested', 5)
+    ])
+    assert keys(classified) == {
+        'completed': {'Jira project ABC': ['ABC-1'], 'GitHub repository app': ['https://github.com/o/app/pull/1']},
+        'in_progress': {'Jira project ABC': ['ABC-2'], 'GitHub repository app': ['https://github.com/o/app/pull/2']},
+        'planned': {'Jira project ABC': ['ABC-3']}
+    }
+
+def test_issue_events_fold_into_the_issue(classifier):
+    classified = classifier.classify([
+        jira('ABC-1#changelog-2', 'Done', 0, 'Status Change', 'In Progress -> Done'),
+        jira('ABC-1#comment-5', 'Done', 1, 'Comment', 'Looks good'),
+        jira('ABC-1#worklog-7', 'Done', 2, 'Work Log', '2h'),
+        jira('ABC-1', 'Done', 3)
+    ])
+    [item] = classified['completed']['Jira project ABC']
+    assert item.text() == "ABC-1: Issue ABC-1 (Done; moved In Progress -> Done; 1 comment; logged 2h)"
+
+def test_commits_fold_into_their_pr_and_prs_into_mentioned_issues(classifier):
+    pr = 'https://github.com/o/app/pull/1'
+    classified = classifier.classify([
+        github('commit', 'https://github.com/o/app/commit/a', 'fix', '', 0, parent=pr),
+        github('pull_request', pr, 'ABC-1 Add login', 'open', 1),
+        jira('ABC-1', 'In Progress', 2),
+        github('commit', 'https://github.com/o/app/commit/b', 'orphan', '', 3)
+    ])
+    assert keys(classified) == {'in_progress': {
+        'Jira project ABC': ['ABC-1'],
+        'GitHub repository app': ['https://github.com/o/app/commit/b']
+    }}
+    assert classified['in_progress']['Jira project ABC'][0].notes == ['PR open +10/-2']
+
+def test_status_bucket_overrides(tmp_path):
+    path = tmp_path / 'status_buckets.json'
+    path.write_text(json.dumps({'jira': {'Release Pending': 'completed'}, 'default': 'planned'}))
+    classifier = ActivityClassifier(load_status_buckets(str(path)))
+    assert classifier.bucket('jira', 'release pending') == 'completed'
+    assert classifier.bucket('jira', 'Something new') == 'planned'
+
+def test_unknown_bucket_in_overrides(tmp_path):
+    path = tmp_path / 'status_buckets.json'
+    path.write_text(json.dumps({'jira': {'Done': 'finished'}}))
+    with pytest.raises(ValueError):
+        load_status_buckets(str(path))
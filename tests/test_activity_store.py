@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+import asyncio
+from services.activity_store import ActivityStore
+from services.shared_state import SQLiteSharedState
+
+def test_sync_after_old_week_does_not_claim_the_gap(tmp_path):
+    store = ActivityStore(str(tmp_path / 'activities.db'))
+    fetched = []
+
+    async def fetch(start_date, end_date):
+        fetched.append((start_date, end_date))
+        return []
+
+    def sync(start_date, end_date):
+        return asyncio.run(store.sync('jira:me', fetch, start_date, end_date, 'key', 'updated', 'updated'))
+
+    now = datetime.now()
+    old_week = (now - timedelta(days=100), now - timedelta(days=93))
+    gap_week = (now - timedelta(days=50), now - timedelta(days=43))
+    sync(*old_week)
+    # the rolling window starts long after the old week was synced
+    sync(now - timedelta(days=14), now)
+
+    assert not store.covers('jira:me', *gap_week)
+    fetched.clear()
+    sync(*gap_week)
+    assert fetched == [gap_week]
+
+def test_waiting_worker_refetches_after_a_backward_only_sync(tmp_path):
+    shared_state = SQLiteSharedState(str(tmp_path / 'shared_state.db'))
+    store = ActivityStore(str(tmp_path / 'activities.db'), shared_state)
+    store.refresh_interval = timedelta(0)
+    fetched = []
+
+    async def fetch(start_date, end_date):
+        fetched.append((start_date, end_date))
+        return []
+
+    async def run():
+        now = datetime.now()
+        # a window running until now, like the rolling report window
+        window = (now - timedelta(days=14), now + timedelta(hours=1))
+        await store.sync('jira:me', fetch, *window, 'key', 'updated', 'updated')
+        state = store.get_sync_state('jira:me')
+
+        # another worker holds the lease and only extends the covered range backward
+        shared_state.acquire('sync:jira:me', 'other', 30)
+        waiting = asyncio.create_task(store.sync('jira:me', fetch, *window, 'key', 'updated', 'updated'))
+        await asyncio.sleep(0.05)
+        store.merge('jira:me', [], 'key', 'updated', 'updated', state['synced_at'], now - timedelta(days=100))
+        shared_state.release('sync:jira:me', 'other')
+        return await waiting
+
+    fetched_count = asyncio.run(run())
+    assert fetched_count == 0
+    assert len(fetched) == 2
@@ -0,0 +1,23 @@
+import pytest
+from services.ai_report_service import ThinkTagFilter
+
+def filtered(chunks):
+    think_filter = ThinkTagFilter()
+    return ''.join(think_filter.feed(chunk) for chunk in chunks) + think_filter.flush()
+
+def test_think_section_removed():
+    assert filtered(['<think>plan</think>\n\nReport']) == 'Report'
+
+@pytest.mark.parametrize('split', range(1, len('<think>x</think>Report')))
+def test_tags_split_across_chunks(split):
+    text = '<think>x</think>Report'
+    assert filtered([text[:split], text[split:]]) == 'Report'
+
+def test_tags_split_into_single_characters():
+    assert filtered(list('Done <think>hidden</think>and more')) == 'Done and more'
+
+def test_partial_tag_at_the_end_is_kept():
+    assert filtered(['a <thi']) == 'a <thi'
+
+def test_unclosed_think_section_is_dropped():
+    assert filtered(['Report<think>never closed']) == 'Report'
@@ -0,0 +1,33 @@
+from email.utils import formatdate
+import time
+import pytest
+from services.github_client import GitHubClient
+
+class FakeResponse:
+    def __init__(self, status: int, headers: dict):
+        self.status = status
+        self.headers = headers
+
+@pytest.fixture
+def client():
+    return GitHubClient({})
+
+def test_retry_after_in_seconds(client):
+    assert client._retry_delay(FakeResponse(429, {'Retry-After': '7'}), b'', 0) == 7
+
+def test_retry_after_as_http_date(client):
+    delay = client._retry_delay(FakeResponse(403, {'Retry-After': formatdate(time.time() + 30, usegmt=True)}), b'', 0)
+    assert 25 <= delay <= 30
+
+def test_retry_after_in_the_past(client):
+    assert client._retry_delay(FakeResponse(429, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}), b'', 0) == 0
+
+def test_invalid_retry_after_falls_back_to_backoff(client):
+    assert client._retry_delay(FakeResponse(429, {'Retry-After': 'soon'}), b'', 1) == 10
+
+def test_exhausted_quota_waits_for_the_reset(client):
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 20)}
+    assert 19 <= client._retry_delay(FakeResponse(403, headers), b'', 0) <= 20
+
+def test_other_client_errors_are_not_retried(client):
+    assert client._retry_delay(FakeResponse(404, {}), b'', 0) is None
@@ -0,0 +1,40 @@
+from services.llm_cache import LLMCache
+
+def make_cache(tmp_path, monkeypatch, **limits) -> LLMCache:
+    for name, value in limits.items():
+        monkeypatch.setenv(f"LLM_CACHE_{name.upper()}", str(value))
+    return LLMCache(str(tmp_path / 'llm_cache.db'))
+
+def test_get_set_and_stats(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    assert cache.get('a') is None
+    cache.set('a', 'report')
+    assert cache.contains('a')
+    assert cache.get('a') == 'report'
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 1, 1)
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_entries=2)
+    cache.set('a', 'first')
+    cache.set('b', 'second')
+    # reading a makes b the least recently used
+    cache.get('a')
+    cache.set('c', 'third')
+    assert cache.contains('a') and cache.contains('c')
+    assert not cache.contains('b')
+
+def test_size_limit(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_bytes=10)
+    cache.set('a', 'x' * 6)
+    cache.set('b', 'y' * 6)
+    assert not cache.contains('a')
+    assert cache.contains('b')
+
+def test_expired_entries_are_not_served(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, ttl=-1)
+    cache.set('a', 'report')
+    assert cache.get('a') is None
+
+def test_key_parts_are_separated():
+    assert LLMCache.make_key('ab', 'c') != LLMCache.make_key('a', 'bc')
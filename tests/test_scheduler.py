@@ -0,0 +1,33 @@
+from datetime import datetime
+import pytest
+from services.scheduler import CronSchedule
+
+def test_next_run_weekly():
+    # Friday 08:00; 2026-10-16 is a Friday
+    schedule = CronSchedule('0 8 * * 5')
+    assert schedule.next_run(datetime(2026, 10, 16, 7, 59)) == datetime(2026, 10, 16, 8, 0)
+    assert schedule.next_run(datetime(2026, 10, 16, 8, 0)) == datetime(2026, 10, 23, 8, 0)
+
+def test_next_run_steps_ranges_and_lists():
+    schedule = CronSchedule('*/15 9-17 * * 1,3')
+    # Wednesday 17:50 -> Monday 09:00
+    assert schedule.next_run(datetime(2026, 10, 14, 17, 50)) == datetime(2026, 10, 19, 9, 0)
+    assert schedule.next_run(datetime(2026, 10, 19, 9, 7, 30)) == datetime(2026, 10, 19, 9, 15)
+
+def test_step_from_a_single_value():
+    schedule = CronSchedule('5/20 * * * *')
+    assert schedule.minutes == {5, 25, 45}
+    assert schedule.next_run(datetime(2026, 10, 16, 10, 30)) == datetime(2026, 10, 16, 10, 45)
+
+def test_next_run_sunday_as_seven_and_either_day_field():
+    assert CronSchedule('0 0 * * 7').next_run(datetime(2026, 10, 16)) == datetime(2026, 10, 18)
+    # day of month 1 or Monday, whichever comes first
+    assert CronSchedule('0 0 1 * 1').next_run(datetime(2026, 10, 16)) == datetime(2026, 10, 19)
+
+def test_invalid_expressions():
+    with pytest.raises(ValueError):
+        CronSchedule('0 8 * *')
+    with pytest.raises(ValueError):
+        CronSchedule('60 8 * * *')
+    with pytest.raises(ValueError):
+        CronSchedule('0 0 30 2 *')